@@ -0,0 +1,415 @@
+# Benchmarks for UniversalLoadBalancer
+# Everything runs on localhost in one process (backends, balancer, clients), no root needed.
+#
+# Relay throughput: compare the proxy_data() relay modes (copy / buffer / splice)
+#   python3 benchmark.py relay --megabytes 512 --chunk-sizes 4096,65536
+#
+# Selection rate: get_next_server() calls/second from many acceptor threads while a fake health
+# checker keeps swapping the healthy set, lock-free snapshot vs the old global-lock version
+#   python3 benchmark.py select --threads 1,8,32 --seconds 2
+#
+# Load test: the balancer runs as its own process (exactly like in production) in front of
+# stand-in echo or HTTP backends, and is driven at a fixed connection rate for every serving mode.
+# Reports conn/s, MB/s, p50/p99 latency and the balancer's own CPU seconds per relayed GB.
+#   python3 benchmark.py load --modes threaded,async,workers --rate 500 --seconds 10 --payload 16384
+#   python3 benchmark.py load --backend http --payload 1048576 --rate 50
+
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import resource
+import signal
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loadbalancer import UniversalLoadBalancer, RELAY_MODES, HAS_SPLICE
+
+
+def free_port():
+    """Ask the OS for a port nobody is using."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+# --- Stand-in backends ---
+
+def start_source_backend(payload_bytes):
+    """Backend that streams `payload_bytes` to every client and then closes (a big download)."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(100)
+    block = b"x" * 65536
+
+    def serve(conn):
+        try:
+            remaining = payload_bytes
+            while remaining > 0:
+                sent = conn.send(block[:remaining])
+                remaining -= sent
+        except OSError:
+            pass  # the health checker hangs up straight away
+        finally:
+            conn.close()
+
+    def accept_loop():
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def start_balancer(backend_ports, mode="threaded", **kwargs):
+    """Start a balancer in a daemon thread and return the port it listens on."""
+    port = free_port()
+    backends = [("127.0.0.1", p) for p in backend_ports]
+    lb = UniversalLoadBalancer("127.0.0.1", port, backends, **kwargs)
+    target = lb.run_async if mode == "async" else lb.run
+    threading.Thread(target=target, daemon=True).start()
+    wait_for_port(port)
+    return lb, port
+
+
+# --- Relay throughput ---
+
+def download(port, chunk_size=65536):
+    """Read everything the balancer relays to us, return the byte count."""
+    total = 0
+    with socket.create_connection(("127.0.0.1", port)) as conn:
+        while True:
+            data = conn.recv(chunk_size)
+            if not data:
+                break
+            total += len(data)
+    return total
+
+
+def relay_throughput(relay, chunk_size, megabytes, connections):
+    payload = megabytes * 1024 * 1024 // connections
+    backend_port = start_source_backend(payload)
+    _, lb_port = start_balancer([backend_port], relay=relay, chunk_size=chunk_size)
+
+    results = [0] * connections
+
+    def worker(i):
+        results[i] = download(lb_port)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(connections)]
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    relayed_mb = sum(results) / (1024 * 1024)
+    return relayed_mb, duration, cpu
+
+
+def run_relay_benchmark(args):
+    chunk_sizes = [int(c) for c in args.chunk_sizes.split(",")]
+    relays = [r for r in RELAY_MODES if r != "splice" or HAS_SPLICE]
+
+    print(f"Relaying {args.megabytes} MB over {args.connections} connection(s) per run")
+    print(f"{'relay':<8} {'chunk':>8} {'MB/s':>10} {'CPU s/GB':>10}")
+    print("-" * 40)
+    for chunk_size in chunk_sizes:
+        for relay in relays:
+            relayed_mb, duration, cpu = relay_throughput(relay, chunk_size, args.megabytes, args.connections)
+            print(f"{relay:<8} {chunk_size:>8} {relayed_mb / duration:>10.1f} {cpu / (relayed_mb / 1024):>10.2f}")
+
+
+# --- Selection rate ---
+
+class LockedSelectionBalancer(UniversalLoadBalancer):
+    """The pre-snapshot get_next_server(): every selection takes the same lock as the health swap."""
+
+    def get_next_server(self, client_addr=None):
+        with self.lock:
+            if not self.healthy_backends:
+                return None
+            server = self.healthy_backends[self.current % len(self.healthy_backends)]
+            self.current += 1
+            return server
+
+
+def selection_rate(lb_class, num_threads, seconds, num_backends=8):
+    ports = [start_source_backend(0) for _ in range(num_backends)]
+    backends = [("127.0.0.1", p) for p in ports]
+    lb = lb_class("127.0.0.1", free_port(), backends)
+    lb.current = 0
+
+    stop = threading.Event()
+
+    def health_swapper():
+        # Much more aggressive than the real checker, to make contention visible
+        for i in itertools.cycle(range(num_backends)):
+            if stop.is_set():
+                return
+            healthy = tuple(b for j, b in enumerate(backends) if j != i)
+            with lb.lock:
+                lb.healthy_backends = healthy
+            time.sleep(0.0001)
+
+    counts = [0] * num_threads
+
+    def acceptor(n):
+        get_next_server = lb.get_next_server
+        count = 0
+        while not stop.is_set():
+            for _ in range(100):
+                get_next_server()
+            count += 100
+        counts[n] = count
+
+    threads = [threading.Thread(target=health_swapper)]
+    threads += [threading.Thread(target=acceptor, args=(n,)) for n in range(num_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    # Measure up to the last join: acceptors finish their current batch after stop
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def run_selection_benchmark(args):
+    thread_counts = [int(t) for t in args.threads.split(",")]
+    print(f"{'threads':>8} {'locked sel/s':>15} {'snapshot sel/s':>15}")
+    print("-" * 40)
+    for n in thread_counts:
+        locked = selection_rate(LockedSelectionBalancer, n, args.seconds)
+        snapshot = selection_rate(UniversalLoadBalancer, n, args.seconds)
+        print(f"{n:>8} {locked:>15,.0f} {snapshot:>15,.0f}")
+
+
+# --- Load test ---
+
+LB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadbalancer.py")
+
+
+class EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                break
+            self.request.sendall(data)
+
+
+class PayloadHTTPHandler(BaseHTTPRequestHandler):
+    """GET /<n> answers n bytes, then closes (HTTP/1.0)."""
+
+    def do_GET(self):
+        size = int(self.path.strip("/") or 0)
+        self.send_response(200)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        block = b"x" * 65536
+        while size > 0:
+            self.wfile.write(block[:size])
+            size -= 65536
+
+    def log_message(self, format, *args):
+        pass
+
+
+def backend_process(kind, ready):
+    if kind == "http":
+        server = ThreadingHTTPServer(("127.0.0.1", 0), PayloadHTTPHandler)
+    else:
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), EchoHandler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_backend_processes(kind, count):
+    """Backends get their own processes so their CPU is never billed to the balancer."""
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Queue()
+    procs = [ctx.Process(target=backend_process, args=(kind, ready), daemon=True) for _ in range(count)]
+    for p in procs:
+        p.start()
+    return procs, [ready.get() for _ in procs]
+
+
+async def one_connection(port, kind, payload, scheduled, latencies):
+    """One client: returns the bytes it moved through the balancer (both directions)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        if kind == "http":
+            request = f"GET /{len(payload)} HTTP/1.0\r\n\r\n".encode()
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read(-1)  # until the backend closes
+            if len(response) < len(payload):
+                raise ConnectionError("short response")
+            moved = len(request) + len(response)
+        else:
+            writer.write(payload)
+            await writer.drain()
+            # No half-close: the balancer tears the pair down as soon as one direction ends
+            await reader.readexactly(len(payload))
+            moved = 2 * len(payload)
+    finally:
+        writer.close()
+    # From the SCHEDULED start, so a stalled balancer can't hide its queueing (coordinated omission)
+    latencies.append(time.perf_counter() - scheduled)
+    return moved
+
+
+async def drive_load(port, kind, rate, seconds, payload_size, max_in_flight):
+    """Open-loop arrivals at `rate` connections/second, at most `max_in_flight` at once."""
+    payload = b"x" * payload_size
+    latencies = []
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = []
+
+    async def client(scheduled):
+        try:
+            return await one_connection(port, kind, payload, scheduled, latencies)
+        except (OSError, asyncio.IncompleteReadError):
+            return None
+        finally:
+            in_flight.release()
+
+    start = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(client(scheduled)))
+    results = await asyncio.gather(*tasks)
+    duration = time.perf_counter() - start
+
+    moved = [r for r in results if r is not None]
+    return latencies, sum(moved), len(results) - len(moved), duration
+
+
+def start_lb_process(mode, backend_ports, args):
+    port = free_port()
+    cmd = [sys.executable, LB_SCRIPT, "--bind", "127.0.0.1", "--port", str(port),
+           "--backends", ",".join(f"127.0.0.1:{p}" for p in backend_ports),
+           "--relay", args.relay, "--chunk-size", str(args.chunk_size)]
+    if mode == "workers":
+        cmd += ["--mode", "async", "--workers", str(args.workers)]
+    else:
+        cmd += ["--mode", mode]
+    if args.max_connections:
+        # Overload test: shed clients show up in the errors column, p99 is for the admitted ones
+        cmd += ["--max-connections", str(args.max_connections)]
+    if args.metrics:
+        cmd += ["--metrics-port", str(free_port())]
+    else:
+        cmd += ["--no-metrics"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    wait_for_port(port)
+    return proc, port
+
+
+def stop_lb_process(proc):
+    # SIGINT = Ctrl-C: lets run_workers() reap its workers, so their CPU shows up in RUSAGE_CHILDREN
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run_load_benchmark(args):
+    modes = args.modes.split(",")
+    backend_procs, backend_ports = start_backend_processes(args.backend, args.backends)
+
+    print(f"{args.backend} backends x{args.backends}, {args.rate} conn/s for {args.seconds}s, "
+          f"{args.payload} byte payload, relay={args.relay}")
+    print(f"{'mode':<10} {'ok':>7} {'errors':>7} {'conn/s':>8} {'MB/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'CPU s/GB':>9}")
+    print("-" * 72)
+    try:
+        for mode in modes:
+            # Only reaped children count, so the delta is exactly this balancer (and its workers)
+            cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+            proc, port = start_lb_process(mode, backend_ports, args)
+            latencies, moved, errors, duration = asyncio.run(
+                drive_load(port, args.backend, args.rate, args.seconds, args.payload, args.max_in_flight))
+            stop_lb_process(proc)
+            cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+            cpu = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+            gigabytes = moved / 1024 ** 3
+            if len(latencies) >= 2:
+                q = statistics.quantiles(latencies, n=100)
+                p50, p99 = q[49] * 1000, q[98] * 1000
+            else:
+                p50 = p99 = float("nan")
+            cpu_per_gb = cpu / gigabytes if gigabytes else float("nan")
+            print(f"{mode:<10} {len(latencies):>7} {errors:>7} {len(latencies) / duration:>8.0f} "
+                  f"{moved / (1024 * 1024) / duration:>8.1f} {p50:>8.2f} {p99:>8.2f} {cpu_per_gb:>9.2f}")
+    finally:
+        for p in backend_procs:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UniversalLoadBalancer benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    relay = sub.add_parser("relay", help="throughput of the proxy_data() relay modes")
+    relay.add_argument("--megabytes", type=int, default=256)
+    relay.add_argument("--connections", type=int, default=4)
+    relay.add_argument("--chunk-sizes", default="4096,65536")
+
+    select = sub.add_parser("select", help="get_next_server() calls/second under concurrent acceptors")
+    select.add_argument("--threads", default="1,8,32")
+    select.add_argument("--seconds", type=float, default=2.0)
+
+    load = sub.add_parser("load", help="end-to-end load test of each serving mode (balancer in its own process)")
+    load.add_argument("--modes", default="threaded,async,workers", help="any of threaded, async, workers")
+    load.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="processes for the workers mode")
+    load.add_argument("--backend", choices=["echo", "http"], default="echo")
+    load.add_argument("--backends", type=int, default=3, help="number of stand-in backends")
+    load.add_argument("--rate", type=float, default=200, help="new connections per second")
+    load.add_argument("--seconds", type=float, default=5)
+    load.add_argument("--payload", type=int, default=16384, help="bytes per request (echoed, or HTTP body size)")
+    load.add_argument("--max-in-flight", type=int, default=1000)
+    load.add_argument("--relay", choices=RELAY_MODES, default="copy")
+    load.add_argument("--chunk-size", type=int, default=65536)
+    load.add_argument("--max-connections", type=int, default=None, help="balancer admission limit (load shedding)")
+    load.add_argument("--metrics", action="store_true", help="keep metrics on (off by default to measure the data plane)")
+
+    args = parser.parse_args()
+    if args.benchmark == "relay":
+        run_relay_benchmark(args)
+    elif args.benchmark == "select":
+        run_selection_benchmark(args)
+    elif args.benchmark == "load":
+        run_load_benchmark(args)
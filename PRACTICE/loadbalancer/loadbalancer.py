@@ -1,9 +1,130 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
 import socket
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import BalancerMetrics, start_metrics_server
+from strategies import BalancingStrategy, STRATEGIES, make_strategy
+
+# os.splice() only exists on Linux with Python 3.10+
+HAS_SPLICE = hasattr(os, "splice")
+
+RELAY_MODES = ("copy", "buffer", "splice")
+
+# What a shed client gets with reject="http" (reject="close" just hangs up)
+HTTP_503 = (b"HTTP/1.1 503 Service Unavailable\r\n"
+            b"Content-Length: 0\r\nConnection: close\r\nRetry-After: 1\r\n\r\n")
+
+
+class BackendHealth:
+    """Rise/fall state of one backend.
+
+    A backend goes DOWN after `fall` failures in a row and comes back UP after `rise`
+    successes in a row, so one lost probe doesn't flap it out of rotation.
+    """
+
+    def __init__(self):
+        self.up = True
+        self.successes = 0
+        self.failures = 0
+        self.next_probe = 0.0  # time.monotonic() of the next active probe
+        self.backoff = 0.0     # current probe interval while down
+
+
+class BackendPool:
+    """Per-backend pool of pre-connected, idle backend sockets.
+
+    The TCP handshake is paid by a background thread ahead of time, so a client grabs a warm
+    socket instead of waiting for connect(). A socket that already relayed a client is NOT put
+    back: at L4 we can't know where one request ends, so handing it to another client could
+    mix their bytes. Idle sockets expire after `idle_timeout` and are checked before use.
+    """
+
+    def __init__(self, max_size=8, idle_timeout=30.0, connect_timeout=1.0):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.idle = {}  # server -> deque of (sock, time it was opened)
+        self.lock = threading.Lock()
+
+    def connect(self, server):
+        sock = socket.create_connection(server, timeout=self.connect_timeout)
+        sock.settimeout(None)
+        # Let the kernel notice backends that vanished while the socket sat in the pool
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return sock
+
+    @staticmethod
+    def is_alive(sock):
+        # Peek without blocking: b'' means the backend already closed its side.
+        # Pending data is fine (e.g. a server greeting) - it stays queued for the client.
+        try:
+            sock.setblocking(False)
+            try:
+                return sock.recv(1, socket.MSG_PEEK) != b""
+            finally:
+                sock.setblocking(True)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, server):
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                idle = self.idle.get(server)
+                if not idle:
+                    break
+                sock, opened_at = idle.popleft()
+            if now - opened_at < self.idle_timeout and self.is_alive(sock):
+                return sock
+            sock.close()
+
+        # Pool ran dry: pay the handshake on the hot path like the non-pooled mode
+        return self.connect(server)
+
+    def fill(self, servers):
+        """Drop expired/dead idle sockets and top every backend back up to max_size."""
+        now = time.monotonic()
+        for server in servers:
+            with self.lock:
+                idle = self.idle.setdefault(server, deque())
+                stale = [(sock, t) for sock, t in idle
+                         if now - t >= self.idle_timeout or not self.is_alive(sock)]
+                for entry in stale:
+                    idle.remove(entry)
+                missing = self.max_size - len(idle)
+            for sock, _ in stale:
+                sock.close()
+
+            for _ in range(missing):
+                try:
+                    sock = self.connect(server)
+                except OSError:
+                    break  # the health checker will take it out of rotation
+                with self.lock:
+                    self.idle.setdefault(server, deque()).append((sock, time.monotonic()))
+
+    def discard(self, server):
+        with self.lock:
+            idle = self.idle.pop(server, deque())
+        for sock, _ in idle:
+            sock.close()
 
 class UniversalLoadBalancer:
-    def __init__(self, bind_address, port, backends):
+    def __init__(self, bind_address, port, backends, relay="copy", chunk_size=4096,
+                 pool_size=0, pool_idle_timeout=30.0, strategy="round_robin", weights=None,
+                 health_interval=5.0, health_timeout=1.0, rise=2, fall=3, max_backoff=60.0,
+                 metrics=True, metrics_address="127.0.0.1", metrics_port=None,
+                 backlog=100, max_connections=None, max_backend_connections=None,
+                 accept_queue=None, handler_threads=8, reject="close"):
 
         self.address = bind_address
         self.port = port
@@ -12,90 +133,609 @@ class UniversalLoadBalancer:
         self.all_backends = backends  
         
         # FIX 2: Initialize this immediately so it exists for the first request
-        self.healthy_backends = list(backends) 
+        # Immutable snapshot: the health checker swaps in a whole new tuple (a single atomic
+        # assignment) and readers never lock, so accepting never waits on the health thread
+        self.healthy_backends = tuple(backends) 
         
-        self.current = 0
+        # Only guards the active_connections counters now
         self.lock = threading.Lock()
 
+        # Which healthy backend gets the next client: a name from STRATEGIES or a BalancingStrategy
+        if not isinstance(strategy, BalancingStrategy):
+            strategy = make_strategy(strategy, weights)
+        self.strategy = strategy
+        # server -> connections being relayed right now (least_connections / power_of_two use it)
+        self.active_connections = {server: 0 for server in backends}
+
+        # How proxy_data() moves bytes between the two sockets (see RELAY_MODES)
+        if relay not in RELAY_MODES:
+            raise ValueError(f"relay must be one of {RELAY_MODES}, got {relay!r}")
+        if relay == "splice" and not HAS_SPLICE:
+            print("--- os.splice not available, falling back to the copy relay ---")
+            relay = "copy"
+        self.relay = relay
+        self.chunk_size = chunk_size
+
+        # Health checking: active probes on a per-backend schedule + passive signals from real traffic
+        self.health = {server: BackendHealth() for server in backends}
+        self.health_lock = threading.Lock()
+        self.health_interval = health_interval  # probe interval of a healthy backend
+        self.health_timeout = health_timeout
+        self.fast_interval = min(1.0, health_interval)  # re-probe soon while a backend is changing state
+        self.max_backoff = max_backoff                  # slowest probe interval of a dead backend
+        self.rise = rise
+        self.fall = fall
+
+        # Pre-fork mode (run_workers): one byte per backend (1 = up), written by the parent's
+        # health checker and read by every worker, so only ONE process probes the backends.
+        # Workers report the connect errors they see through shared_failures (one counter per backend)
+        self.shared_health = None
+        self.shared_failures = None
+        self.is_worker = False
+
+        # Opt-in warm backend connections (pool_size=0 keeps the old connect-per-client behaviour)
+        self.pool = BackendPool(pool_size, pool_idle_timeout) if pool_size > 0 else None
+
+        # Per-backend counters/histograms (metrics=False: nothing is recorded at all, for benchmarks)
+        # served as Prometheus text on metrics_address:metrics_port/metrics when a port is given
+        self.metrics = BalancerMetrics(backends) if metrics else None
+        self.metrics_address = metrics_address
+        self.metrics_port = metrics_port
+
+        # Load shedding: past these limits a client is rejected right away (closed, or a 503 with
+        # reject="http") instead of queueing up, so the admitted ones keep a flat tail latency
+        if reject not in ("close", "http"):
+            raise ValueError(f"reject must be 'close' or 'http', got {reject!r}")
+        self.backlog = backlog
+        self.max_connections = max_connections                  # whole balancer (None = unlimited)
+        self.max_backend_connections = max_backend_connections  # per backend (None = unlimited)
+        self.accept_queue = accept_queue        # threaded mode: bounded queue in front of handle_request()
+        self.handler_threads = handler_threads  # ... drained by this many handler threads
+        self.reject_mode = reject
+        self.total_connections = 0              # admitted clients, guarded by self.lock
+
+        # Async mode: the relay tasks still running, so shutdown can cancel and wait for them
+        self.client_tasks = set()
+
         # Start the background health checker
         threading.Thread(target=self.health_check, daemon=True).start()
 
-    def health_check(self):
+    def probe(self, server):
+        try:
+            # The timeout is key so we don't hang the thread on a dead server
+            with socket.create_connection(server, timeout=self.health_timeout):
+                return True
+        except OSError:
+            return False
+
+    def health_check(self, tick=0.1):
 
+        # Probes run in parallel: a sweep costs ONE timeout, not one per dead backend
+        with ThreadPoolExecutor(max_workers=max(1, len(self.all_backends))) as executor:
+            while True:
+                self.collect_worker_failures()
+
+                now = time.monotonic()
+                due = [server for server in self.all_backends if self.health[server].next_probe <= now]
+                if due:
+                    results = list(executor.map(self.probe, due))
+                    with self.health_lock:
+                        for server, ok in zip(due, results):
+                            self.record_result(server, ok)
+                    self.rebuild_snapshot()
+
+                time.sleep(tick)
+
+    def record_result(self, server, ok):
+        # Caller holds health_lock. Updates the rise/fall counters and schedules the next probe.
+        h = self.health[server]
+        now = time.monotonic()
+        if ok:
+            h.successes += 1
+            h.failures = 0
+            if not h.up and h.successes >= self.rise:
+                h.up = True
+                h.backoff = 0.0
+                print(f"--- SERVER {server[1]} IS BACK UP ---")
+        else:
+            h.failures += 1
+            h.successes = 0
+            if h.up and h.failures >= self.fall:
+                h.up = False
+                print(f"--- SERVER {server[1]} IS DOWN! ---")
+
+        if h.up and h.failures == 0:
+            h.next_probe = now + self.health_interval
+        elif h.up or ok:
+            # Suspect (failing but not down yet) or recovering: confirm quickly
+            h.next_probe = now + self.fast_interval
+        else:
+            # Still down: back off exponentially so dead nodes cost almost nothing
+            h.backoff = min(max(h.backoff * 2, self.health_interval), self.max_backoff)
+            h.next_probe = now + h.backoff
+
+    def rebuild_snapshot(self):
+        with self.health_lock:
+            self.healthy_backends = tuple(s for s in self.all_backends if self.health[s].up)
+        self.publish_health()
+
+    def report_failure(self, server):
+        """Passive health check: a real client couldn't connect to `server`.
+
+        Counts like a failed probe, so under traffic a dead backend is ejected after `fall`
+        failed requests - milliseconds - instead of waiting for the next probe.
+        """
+        if self.is_worker:
+            # Pre-fork worker: the parent owns the health state, hand it the signal
+            with self.shared_failures.get_lock():
+                self.shared_failures[self.all_backends.index(server)] += 1
+            return
+
+        with self.health_lock:
+            self.record_result(server, False)
+        self.rebuild_snapshot()
+
+    def collect_worker_failures(self):
+        # Parent side of report_failure() in pre-fork mode
+        shared = self.shared_failures
+        if shared is None:
+            return
+        with shared.get_lock():
+            counts = list(shared)
+            for i in range(len(counts)):
+                shared[i] = 0
+        if any(counts):
+            with self.health_lock:
+                for server, n in zip(self.all_backends, counts):
+                    for _ in range(n):
+                        self.record_result(server, False)
+            self.rebuild_snapshot()
+
+    def publish_health(self):
+        # Pre-fork mode: copy the current snapshot into the array the workers read
+        shared = self.shared_health
+        if shared is not None:
+            healthy = self.healthy_backends
+            for i, server in enumerate(self.all_backends):
+                shared[i] = 1 if server in healthy else 0
+
+    def sync_shared_health(self, interval=0.1):
+        # Worker side of the pre-fork mode: mirror the parent's verdict instead of probing ourselves
+        while True:
+            self.healthy_backends = tuple(server for server, up in zip(self.all_backends, self.shared_health) if up)
+            time.sleep(interval)
+
+    def maintain_pool(self, interval=1.0):
+        # Keeps warm sockets for healthy backends only, and drops the ones of dead backends
         while True:
-            alive = []
+            healthy = self.healthy_backends
             for server in self.all_backends:
-                try:
-                    # Timeout=1 is key so we don't hang the thread on a dead server
-                    with socket.create_connection(server, timeout=1):
-                        alive.append(server)
-                except:
-                    print(f"--- SERVER {server[1]} IS DOWN! ---")
-            
-            with self.lock:
-                self.healthy_backends = alive
-            
-            time.sleep(5) 
+                if server not in healthy:
+                    self.pool.discard(server)
+            self.pool.fill(healthy)
+            time.sleep(interval)
+
+    def start_pool(self):
+        # Started by run()/run_async() rather than __init__, so in pre-fork mode every worker
+        # owns its pool and no socket is shared between processes
+        if self.pool is not None:
+            threading.Thread(target=self.maintain_pool, daemon=True).start()
+
+    def start_metrics(self):
+        # Same reasoning as start_pool(): each pre-fork worker serves its own numbers
+        if self.metrics is not None and self.metrics_port is not None:
+            start_metrics_server(self, self.metrics_address, self.metrics_port)
         
-    def get_next_server(self):
+    def get_next_server(self, client_addr=None):
 
-        with self.lock:
-            if not self.healthy_backends:
-                print("!!! NO HEALTHY BACKENDS AVAILABLE !!!")
+        # Read the snapshot ONCE: it can't change under us, even if the health checker swaps it now
+        backends = self.healthy_backends
+        if not backends:
+            print("!!! NO HEALTHY BACKENDS AVAILABLE !!!")
+            if self.metrics is not None:
+                self.metrics.no_backend_available()
+            return None
+        
+        active = self.active_connections
+        server = self.strategy.select(backends, client_addr, active)
+
+        limit = self.max_backend_connections
+        if limit is not None and active.get(server, 0) >= limit:
+            # The strategy's pick is full: spill over to the least busy backend that still has room
+            # (the strategy still sees the full snapshot, so hash rings don't churn under load)
+            server = min(backends, key=lambda s: active.get(s, 0))
+            if active.get(server, 0) >= limit:
+                if self.metrics is not None:
+                    self.metrics.rejected("backend_limit")
                 return None
-            
-            # Use modulo to cycle through only the healthy ones
-            server = self.healthy_backends[self.current % len(self.healthy_backends)]
-            self.current += 1
-            return server
+        return server
+
+    def connection_opened(self, server):
+        with self.lock:
+            self.active_connections[server] = self.active_connections.get(server, 0) + 1
+
+    def connection_closed(self, server):
+        with self.lock:
+            self.active_connections[server] -= 1
+
+    # --- Admission control ---
+    # Limits are soft: check and increment aren't one atomic step across acceptors,
+    # so a burst can overshoot by a few connections, never by an unbounded amount.
+
+    def admit(self):
+        """Take one slot of max_connections, False if the balancer is full."""
+        with self.lock:
+            if self.max_connections is not None and self.total_connections >= self.max_connections:
+                return False
+            self.total_connections += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.total_connections -= 1
+
+    def reject(self, client_conn, reason=None):
+        # Fast path: no backend work at all, the client learns immediately.
+        # reason=None: get_next_server() already recorded why
+        if self.metrics is not None and reason is not None:
+            self.metrics.rejected(reason)
+        if self.reject_mode == "http":
+            try:
+                client_conn.setblocking(False)
+                client_conn.send(HTTP_503)  # fits the socket buffer, never worth blocking for
+            except OSError:
+                pass
+        client_conn.close()
+
+    async def reject_async(self, client_writer, reason=None):
+        if self.metrics is not None and reason is not None:
+            self.metrics.rejected(reason)
+        if self.reject_mode == "http":
+            client_writer.write(HTTP_503)
+        client_writer.close()
+
+    def proxy_data(self, source, destination, on_done=None):
 
-    def proxy_data(self, source, destination):
+        # on_done(bytes relayed) runs once this direction is finished and both sockets are closed
+        moved = 0
+        try:
+            if self.relay == "splice":
+                moved = self._relay_splice(source, destination)
+            elif self.relay == "buffer":
+                moved = self._relay_buffer(source, destination)
+            else:
+                moved = self._relay_copy(source, destination)
+        except Exception:
+            pass
+        finally:
+            # shutdown() first: close() alone won't wake the opposite proxy_data thread
+            # still blocked in recv() on the same socket, so the peer would never see EOF
+            for sock in (source, destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+            if on_done is not None:
+                on_done(moved)
 
+    # The _relay_* loops return how many bytes they moved. A reset, or the other direction
+    # tearing the pair down, is the normal way for them to end, so OSError just stops the count.
+
+    def _relay_copy(self, source, destination):
+        # Every chunk becomes a brand-new bytes object: kernel -> Python -> kernel
+        total = 0
         try:
             while True:
-                data = source.recv(4096)
+                data = source.recv(self.chunk_size)
                 if not data:
                     break
                 destination.sendall(data)
-        except Exception:
+                total += len(data)
+        except OSError:
             pass
+        return total
+
+    def _relay_buffer(self, source, destination):
+        # One buffer per direction, reused for the whole connection: no allocation per chunk
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        total = 0
+        try:
+            while True:
+                n = source.recv_into(buf)
+                if not n:
+                    break
+                destination.sendall(view[:n])
+                total += n
+        except OSError:
+            pass
+        return total
+
+    def _relay_splice(self, source, destination):
+        # Zero-copy (Linux): socket -> pipe -> socket, the bytes never enter Python
+        read_fd, write_fd = os.pipe()
+        try:
+            try:
+                # A bigger pipe lets one splice() move a whole chunk (default pipe is 64KB)
+                import fcntl
+                fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, self.chunk_size)
+            except (ImportError, AttributeError, OSError):
+                pass
+
+            src_fd, dst_fd = source.fileno(), destination.fileno()
+            total = 0
+            try:
+                while True:
+                    n = os.splice(src_fd, write_fd, self.chunk_size)
+                    if n == 0:
+                        break
+                    total += n
+                    while n:
+                        n -= os.splice(read_fd, dst_fd, n)
+            except OSError:
+                pass
+            return total
         finally:
-            source.close()
-            destination.close()
+            os.close(read_fd)
+            os.close(write_fd)
 
-    def handle_request(self, client_conn):
+    def handle_request(self, client_conn, client_addr=None):
 
-        server_info = self.get_next_server()
+        # The caller already took a slot with admit(): every way out of here gives it back
+        server_info = self.get_next_server(client_addr)
         if not server_info:
-            client_conn.close()
+            self.release()
+            self.reject(client_conn)
             return
 
+        # Count the connection before connect(), so per-backend limits and least_connections
+        # also see the handshakes in flight
+        self.connection_opened(server_info)
         backend_host, backend_port = server_info
-        backend_conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connect_start = time.perf_counter()
         try:
-            backend_conn.connect((backend_host, backend_port))
-            
-            t1 = threading.Thread(target=self.proxy_data, args=(client_conn, backend_conn))
-            t2 = threading.Thread(target=self.proxy_data, args=(backend_conn, client_conn))
-            
-            t1.start()
-            t2.start()
+            if self.pool is not None:
+                backend_conn = self.pool.acquire(server_info)
+            else:
+                backend_conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                backend_conn.connect((backend_host, backend_port))
         except Exception as e:
             print(f"Failed to connect to backend {backend_port}: {e}")
+            self.connection_closed(server_info)
+            self.release()
+            self.report_failure(server_info)
+            if self.metrics is not None:
+                self.metrics.connect_failed(server_info)
             client_conn.close()
+            return
 
-    def run(self):
+        relay_start = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.connected(server_info, relay_start - connect_start)
+
+        # The client -> backend pipe always ends after the pair is torn down, so it does the bookkeeping
+        def client_side_done(moved):
+            self.connection_closed(server_info)
+            self.release()
+            if self.metrics is not None:
+                self.metrics.relayed(server_info, to_backend=moved, seconds=time.perf_counter() - relay_start)
+
+        def backend_side_done(moved):
+            if self.metrics is not None:
+                self.metrics.relayed(server_info, to_client=moved)
+
+        t1 = threading.Thread(target=self.proxy_data, args=(client_conn, backend_conn),
+                              kwargs={"on_done": client_side_done})
+        t2 = threading.Thread(target=self.proxy_data, args=(backend_conn, client_conn),
+                              kwargs={"on_done": backend_side_done})
+        
+        t1.start()
+        t2.start()
+
+    def run(self, reuse_port=False):
         
+        self.start_pool()
+        self.start_metrics()
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             # Allow address reuse so you can restart the LB immediately
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                # Every worker binds the same port, the kernel spreads new connections across them
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             s.bind((self.address, self.port))
-            s.listen(100)
+            s.listen(self.backlog)
             print(f"Load Balancer active on {self.address}:{self.port}")
+
+            pending = None
+            if self.accept_queue is not None:
+                # Bounded: a fixed set of handler threads instead of one new thread per accept
+                pending = queue.Queue(maxsize=self.accept_queue)
+                for _ in range(self.handler_threads):
+                    threading.Thread(target=self.handler_loop, args=(pending,), daemon=True).start()
             
             while True:
                 client_conn, addr = s.accept()
-                threading.Thread(target=self.handle_request, args=(client_conn,)).start()
+                if not self.admit():
+                    self.reject(client_conn, "max_connections")
+                    continue
+                if pending is None:
+                    threading.Thread(target=self.handle_request, args=(client_conn, addr)).start()
+                    continue
+                try:
+                    pending.put_nowait((client_conn, addr))
+                except queue.Full:
+                    self.release()
+                    self.reject(client_conn, "queue_full")
+
+    def handler_loop(self, pending):
+        while True:
+            client_conn, addr = pending.get()
+            self.handle_request(client_conn, addr)
+
+    # --- Event-loop data plane ---
+    # The threaded mode above costs 3 threads per client (accept handler + 2 proxy_data pipes),
+    # so a few thousand clients hit thread limits and context-switch overhead.
+    # Here every client/backend pair is multiplexed on ONE asyncio loop: the limit becomes file descriptors.
+    # Backend list, health checker thread and get_next_server() are shared with the threaded mode.
+
+    async def proxy_data_async(self, reader, writer):
+
+        total = 0
+        try:
+            while True:
+                data = await reader.read(self.chunk_size)
+                if not data:
+                    break
+                writer.write(data)
+                # drain() is the backpressure: we stop reading while the other side can't keep up
+                await writer.drain()
+                total += len(data)
+        except Exception:
+            pass
+        finally:
+            # Same as proxy_data(): once one direction ends, tear the pair down
+            writer.close()
+        return total
+
+    async def handle_request_async(self, client_reader, client_writer):
+
+        if not self.admit():
+            await self.reject_async(client_writer, "max_connections")
+            return
+        task = asyncio.current_task()
+        self.client_tasks.add(task)
+        try:
+            await self.relay_async(client_reader, client_writer)
+        except asyncio.CancelledError:
+            # Shutting down (serve_async cancels us), relay_async already closed both sides.
+            # Ending quietly: on 3.11 start_server prints a traceback for every cancelled handler
+            pass
+        finally:
+            self.client_tasks.discard(task)
+            self.release()
+
+    async def relay_async(self, client_reader, client_writer):
+
+        server_info = self.get_next_server(client_writer.get_extra_info("peername"))
+        if not server_info:
+            await self.reject_async(client_writer)
+            return
+
+        # Counted before connect(), same as handle_request()
+        self.connection_opened(server_info)
+        backend_host, backend_port = server_info
+        connect_start = time.perf_counter()
+        try:
+            if self.pool is not None:
+                # acquire() may connect() when the pool is empty, keep that off the event loop
+                sock = await asyncio.to_thread(self.pool.acquire, server_info)
+                backend_reader, backend_writer = await asyncio.open_connection(sock=sock)
+            else:
+                backend_reader, backend_writer = await asyncio.open_connection(backend_host, backend_port)
+        except Exception as e:
+            print(f"Failed to connect to backend {backend_port}: {e}")
+            self.connection_closed(server_info)
+            self.report_failure(server_info)
+            if self.metrics is not None:
+                self.metrics.connect_failed(server_info)
+            client_writer.close()
+            return
+
+        relay_start = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.connected(server_info, relay_start - connect_start)
+
+        # Two coroutines instead of two threads
+        to_backend = to_client = 0
+        try:
+            to_backend, to_client = await asyncio.gather(
+                self.proxy_data_async(client_reader, backend_writer),
+                self.proxy_data_async(backend_reader, client_writer),
+            )
+        finally:
+            self.connection_closed(server_info)
+            if self.metrics is not None:
+                self.metrics.relayed(server_info, to_backend, to_client, time.perf_counter() - relay_start)
+            client_writer.close()
+            backend_writer.close()
+
+    async def serve_async(self, reuse_port=False):
+
+        server = await asyncio.start_server(
+            self.handle_request_async, self.address, self.port,
+            backlog=self.backlog, reuse_address=True, reuse_port=reuse_port or None,
+        )
+        print(f"Load Balancer (async) active on {self.address}:{self.port}")
+        async with server:
+            try:
+                # start_server() is already accepting. Not serve_forever(): on 3.12 a cancelled
+                # serve_forever() waits for every client to disconnect before we get to close them
+                await asyncio.get_running_loop().create_future()
+            finally:
+                # Ctrl-C cancels us here: stop the relays ourselves and wait for them, so every
+                # socket pair is closed (and counted) before asyncio.run() tears the loop down
+                for task in list(self.client_tasks):
+                    task.cancel()
+                await asyncio.gather(*self.client_tasks, return_exceptions=True)
+
+    def run_async(self, reuse_port=False):
+        self.start_pool()
+        self.start_metrics()
+        try:
+            asyncio.run(self.serve_async(reuse_port))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # asyncio.run() turns Ctrl-C into KeyboardInterrupt once the shutdown above is done
+            print("Load Balancer stopped")
+
+    # --- Pre-fork worker mode ---
+    # One interpreter = one GIL = relaying pinned to one core.
+    # Here N forked workers each bind the same port with SO_REUSEPORT and run their own accept loop
+    # (threaded or async). The parent only runs the health checker and shares the result through
+    # a shared-memory byte array, so the backends get probed once, not once per worker.
+
+    def _worker_main(self, mode, index):
+        # Only the forking thread survives fork(): the parent's health checker isn't running here,
+        # and the lock may have been copied while held, so start from a fresh one
+        self.lock = threading.Lock()
+        self.health_lock = threading.Lock()
+        self.is_worker = True
+        if self.metrics_port is not None:
+            # One admin port per worker: metrics_port, metrics_port + 1, ...
+            self.metrics_port += index
+        threading.Thread(target=self.sync_shared_health, daemon=True).start()
+        if mode == "async":
+            self.run_async(reuse_port=True)
+        else:
+            self.run(reuse_port=True)
+
+    def run_workers(self, num_workers, mode="threaded"):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+
+        # fork (not spawn) so workers inherit this object and the shared array as-is
+        ctx = multiprocessing.get_context("fork")
+        # Array first, snapshot second: whichever of us and the health thread publishes last
+        # reads the newest snapshot, so the workers never start from a stale verdict
+        self.shared_health = ctx.RawArray('b', len(self.all_backends))
+        self.shared_failures = ctx.Array('i', len(self.all_backends))
+        self.publish_health()
+
+        workers = [ctx.Process(target=self._worker_main, args=(mode, i), daemon=True)
+                   for i in range(num_workers)]
+        for w in workers:
+            w.start()
+        print(f"Started {num_workers} {mode} workers on {self.address}:{self.port} (SO_REUSEPORT)")
+
+        try:
+            for w in workers:
+                w.join()
+        except KeyboardInterrupt:
+            for w in workers:
+                w.terminate()
+            for w in workers:
+                w.join()
+
 
 my_servers = [
     ('127.0.0.1', 8001), 
@@ -103,5 +743,65 @@ my_servers = [
     ('127.0.0.1', 8003)
 ]
 
-lb = UniversalLoadBalancer('0.0.0.0', 80, my_servers)
-lb.run()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Universal TCP load balancer")
+    parser.add_argument("--bind", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--backends", default=None,
+                        help="comma separated host:port list (default: the my_servers list above)")
+    parser.add_argument("--mode", choices=["threaded", "async"], default="threaded",
+                        help="threaded: 3 threads per client, async: one event loop for every client")
+    parser.add_argument("--relay", choices=RELAY_MODES, default="copy",
+                        help="threaded mode only: copy (recv/sendall), buffer (recv_into), splice (zero-copy, Linux)")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="pre-fork N processes sharing the port with SO_REUSEPORT (0 = single process)")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="warm connections kept open per backend (0 = connect per client)")
+    parser.add_argument("--pool-idle-timeout", type=float, default=30.0)
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="round_robin")
+    parser.add_argument("--weights", default=None,
+                        help="weighted strategy: comma separated weights, in backend order (e.g. 5,1,1)")
+    parser.add_argument("--health-interval", type=float, default=5.0)
+    parser.add_argument("--rise", type=int, default=2, help="successes in a row to bring a backend back")
+    parser.add_argument("--fall", type=int, default=3, help="failures in a row (probes or real requests) to eject it")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="admin port serving /metrics on 127.0.0.1, off unless given (worker i uses port + i)")
+    parser.add_argument("--no-metrics", action="store_true", help="record nothing, e.g. for benchmarking")
+    parser.add_argument("--backlog", type=int, default=100, help="listen() backlog")
+    parser.add_argument("--max-connections", type=int, default=None, help="clients relayed at once, past it they are shed")
+    parser.add_argument("--max-backend-connections", type=int, default=None, help="same limit, per backend")
+    parser.add_argument("--accept-queue", type=int, default=None,
+                        help="threaded mode: bounded queue + fixed handler threads instead of a thread per accept")
+    parser.add_argument("--handler-threads", type=int, default=8)
+    parser.add_argument("--reject", choices=["close", "http"], default="close",
+                        help="what a shed client gets: an immediate close or an HTTP 503")
+    args = parser.parse_args()
+
+    if args.backends:
+        my_servers = [(host, int(port)) for host, port in
+                      (backend.rsplit(":", 1) for backend in args.backends.split(","))]
+
+    weights = None
+    if args.weights:
+        weights = dict(zip(my_servers, (int(w) for w in args.weights.split(","))))
+
+    lb = UniversalLoadBalancer(args.bind, args.port, my_servers, relay=args.relay, chunk_size=args.chunk_size,
+                               pool_size=args.pool_size, pool_idle_timeout=args.pool_idle_timeout,
+                               strategy=args.strategy, weights=weights,
+                               health_interval=args.health_interval, rise=args.rise, fall=args.fall,
+                               metrics=not args.no_metrics, metrics_port=args.metrics_port or None,
+                               backlog=args.backlog, max_connections=args.max_connections,
+                               max_backend_connections=args.max_backend_connections,
+                               accept_queue=args.accept_queue, handler_threads=args.handler_threads,
+                               reject=args.reject)
+    try:
+        if args.workers > 0:
+            lb.run_workers(args.workers, args.mode)
+        elif args.mode == "async":
+            lb.run_async()
+        else:
+            lb.run()
+    except KeyboardInterrupt:
+        print("Load Balancer stopped")
+
@@ -0,0 +1,152 @@
+# Metrics for UniversalLoadBalancer, exposed in the Prometheus text format
+#
+# Cheap on the hot path: everything is recorded ONCE per connection (never per chunk),
+# under one short lock. Pass metrics=False to the balancer to skip it entirely.
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency buckets
+CONNECT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+RELAY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    """Fixed buckets, like a Prometheus histogram: observe() is one bisect and two additions."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class BackendMetrics:
+    def __init__(self):
+        self.connections = 0
+        self.connect_errors = 0
+        self.bytes_to_backend = 0
+        self.bytes_to_client = 0
+        self.connect_seconds = Histogram(CONNECT_BUCKETS)
+        self.relay_seconds = Histogram(RELAY_BUCKETS)
+
+
+class BalancerMetrics:
+    """Per-backend counters and histograms. Gauges (up, active) are read from the balancer at scrape time."""
+
+    def __init__(self, backends):
+        self.backends = {server: BackendMetrics() for server in backends}
+        self.no_backend = 0
+        self.rejected_by_reason = {}
+        self.lock = threading.Lock()
+
+    def connected(self, server, seconds):
+        with self.lock:
+            m = self.backends[server]
+            m.connections += 1
+            m.connect_seconds.observe(seconds)
+
+    def connect_failed(self, server):
+        with self.lock:
+            self.backends[server].connect_errors += 1
+
+    def no_backend_available(self):
+        with self.lock:
+            self.no_backend += 1
+
+    def rejected(self, reason):
+        with self.lock:
+            self.rejected_by_reason[reason] = self.rejected_by_reason.get(reason, 0) + 1
+
+    def relayed(self, server, to_backend=0, to_client=0, seconds=None):
+        with self.lock:
+            m = self.backends[server]
+            m.bytes_to_backend += to_backend
+            m.bytes_to_client += to_client
+            if seconds is not None:
+                m.relay_seconds.observe(seconds)
+
+    def render(self, healthy, active):
+        """The whole registry as Prometheus text exposition format."""
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            items = [(f'backend="{host}:{port}"', (host, port), m) for (host, port), m in self.backends.items()]
+
+            family("lb_backend_up", "gauge", "1 if the backend is in rotation")
+            out += [f"lb_backend_up{{{labels}}} {1 if server in healthy else 0}" for labels, server, _ in items]
+
+            family("lb_active_connections", "gauge", "Connections being relayed right now")
+            out += [f"lb_active_connections{{{labels}}} {active.get(server, 0)}" for labels, server, _ in items]
+
+            family("lb_connections_total", "counter", "Client connections relayed to the backend")
+            out += [f"lb_connections_total{{{labels}}} {m.connections}" for labels, _, m in items]
+
+            family("lb_connect_errors_total", "counter", "Failed connects to the backend")
+            out += [f"lb_connect_errors_total{{{labels}}} {m.connect_errors}" for labels, _, m in items]
+
+            family("lb_bytes_total", "counter", "Bytes relayed, per direction")
+            for labels, _, m in items:
+                out.append(f'lb_bytes_total{{{labels},direction="to_backend"}} {m.bytes_to_backend}')
+                out.append(f'lb_bytes_total{{{labels},direction="to_client"}} {m.bytes_to_client}')
+
+            family("lb_connect_seconds", "histogram", "Time to get a backend connection")
+            for labels, _, m in items:
+                out += m.connect_seconds.render("lb_connect_seconds", labels)
+
+            family("lb_relay_seconds", "histogram", "Lifetime of a relayed client connection")
+            for labels, _, m in items:
+                out += m.relay_seconds.render("lb_relay_seconds", labels)
+
+            family("lb_no_backend_total", "counter", "Clients dropped because no backend was healthy")
+            out.append(f"lb_no_backend_total {self.no_backend}")
+
+            family("lb_rejected_total", "counter", "Clients shed by the admission limits, per reason")
+            out += [f'lb_rejected_total{{reason="{reason}"}} {n}' for reason, n in sorted(self.rejected_by_reason.items())]
+
+        return "\n".join(out) + "\n"
+
+
+def start_metrics_server(lb, address, port):
+    """Serve GET /metrics for `lb` from a daemon thread (the admin port)."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = lb.metrics.render(lb.healthy_backends, lb.active_connections).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the console
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics available on http://{address}:{port}/metrics")
+    return server
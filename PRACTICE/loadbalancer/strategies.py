@@ -0,0 +1,132 @@
+# Balancing strategies for UniversalLoadBalancer (Strategy pattern)
+# Every strategy answers one question: "which healthy backend gets this client?"
+#
+# select(backends, client_addr, active)
+#   backends    -> snapshot tuple of the currently healthy (host, port), never empty
+#   client_addr -> (ip, port) of the client, or None if unknown
+#   active      -> {server: number of connections currently relayed to it}
+#
+# select() is called from many acceptor threads at once WITHOUT any balancer lock,
+# so a strategy that keeps state has to be safe on its own.
+
+import bisect
+import hashlib
+import itertools
+import random
+import threading
+
+
+class BalancingStrategy:
+    """Base class: pick one server out of the healthy backends."""
+
+    def select(self, backends, client_addr, active):
+        raise NotImplementedError
+
+
+class RoundRobin(BalancingStrategy):
+    """The original behaviour: cycle through the healthy backends with a counter."""
+
+    def __init__(self):
+        # next() on itertools.count is a single C call, atomic under the GIL: no lock, no lost updates
+        self.counter = itertools.count()
+
+    def select(self, backends, client_addr, active):
+        # Use modulo to cycle through only the healthy ones
+        return backends[next(self.counter) % len(backends)]
+
+
+class LeastConnections(BalancingStrategy):
+    """Send the client to the backend relaying the fewest connections right now.
+    Slow backends hold on to their connections longer, so they naturally get less new work."""
+
+    def select(self, backends, client_addr, active):
+        return min(backends, key=lambda server: active.get(server, 0))
+
+
+class WeightedRoundRobin(BalancingStrategy):
+    """Smooth weighted round-robin (the nginx algorithm).
+    With weights 5:1:1 the order is a a b a c a a, not a a a a a b c - bursts are spread out."""
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})  # server -> weight, missing servers weigh 1
+        self.current_weight = {}
+        # The read-modify-write of current_weight isn't atomic; this lock is private to the
+        # strategy, so it never contends with the health checker
+        self.lock = threading.Lock()
+
+    def select(self, backends, client_addr, active):
+        with self.lock:
+            total = 0
+            best = None
+            for server in backends:
+                weight = self.weights.get(server, 1)
+                self.current_weight[server] = self.current_weight.get(server, 0) + weight
+                total += weight
+                if best is None or self.current_weight[server] > self.current_weight[best]:
+                    best = server
+            self.current_weight[best] -= total
+            return best
+
+
+class PowerOfTwoChoices(BalancingStrategy):
+    """Pick two random backends, keep the one with fewer active connections.
+    Almost as good as least-connections without looking at every backend."""
+
+    def select(self, backends, client_addr, active):
+        if len(backends) == 1:
+            return backends[0]
+        a, b = random.sample(backends, 2)
+        return a if active.get(a, 0) <= active.get(b, 0) else b
+
+
+class ConsistentHash(BalancingStrategy):
+    """Session affinity: the same client IP always lands on the same backend.
+    Each backend is placed `vnodes` times on a hash ring, so when one joins or leaves
+    only ~1/N of the clients move instead of almost all of them (plain hash % N)."""
+
+    def __init__(self, vnodes=100):
+        self.vnodes = vnodes
+        # (members, hashes, servers), replaced as a whole so readers never see a half-built ring
+        self.ring = (None, [], [])
+
+    @staticmethod
+    def hash_key(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def build_ring(self, backends):
+        ring = sorted(
+            (self.hash_key(f"{host}:{port}#{i}"), (host, port))
+            for host, port in backends
+            for i in range(self.vnodes)
+        )
+        return (tuple(backends), [h for h, _ in ring], [server for _, server in ring])
+
+    def select(self, backends, client_addr, active):
+        ring = self.ring
+        # Only rebuild when the health checker changed the membership
+        if ring[0] != tuple(backends):
+            ring = self.build_ring(backends)
+            self.ring = ring
+        members, hashes, servers = ring
+
+        # Hash the IP only: the client port changes on every connection
+        key = client_addr[0] if client_addr else ""
+        i = bisect.bisect(hashes, self.hash_key(key)) % len(hashes)
+        return servers[i]
+
+
+STRATEGIES = {
+    "round_robin": RoundRobin,
+    "least_connections": LeastConnections,
+    "weighted": WeightedRoundRobin,
+    "power_of_two": PowerOfTwoChoices,
+    "consistent_hash": ConsistentHash,
+}
+
+
+def make_strategy(name, weights=None):
+    if name not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {tuple(STRATEGIES)}, got {name!r}")
+    if name == "weighted":
+        return WeightedRoundRobin(weights)
+    return STRATEGIES[name]()
@@ -0,0 +1,501 @@
+# Benchmarks for the CSV converter service (project1.py)
+# Runs in-process on synthetic CSV data, no server needed (except `load --url`).
+#
+# Validation: per-row Pydantic models vs the columnar numpy validator, same rows, same result
+#   python3 project1_benchmark.py validate --rows 200000 --invalid 0.1
+#
+# Parallel: one big upload converted in-process vs split over the process pool, plus the worst
+# event-loop stall seen meanwhile (what every other request on the server would have to wait)
+#   python3 project1_benchmark.py parallel --rows 2000000 --workers 4
+#
+# Memory: peak RSS of a streamed conversion for growing inputs, each size in a fresh process.
+# The CSV is generated on the fly, so the only thing that could grow is the converter itself.
+#   python3 project1_benchmark.py memory --rows 10000,100000,1000000
+#
+# Aggregation: running float totals vs exact totals, speed and how far the float total drifted
+#   python3 project1_benchmark.py aggregate --rows 1000000
+#
+# Output: the valid records as NDJSON vs the columnar binary formats, size and write/read time
+#   python3 project1_benchmark.py output --rows 1000000
+#
+# Load: concurrent clients POSTing synthetic CSVs to /api/convert through the ASGI app in-process
+# (or a running server with --url). Per ingestion mode: rows/s, p50/p99 latency and peak RSS of
+# the process serving the app, each mode in a fresh process. --max-p99-ms / --min-rows-per-second
+# turn it into a pre-deploy check: exit status 1 when a mode misses them.
+#   python3 project1_benchmark.py load --rows 50000 --clients 8 --requests 64
+#   python3 project1_benchmark.py load --url http://127.0.0.1:8000 --max-p99-ms 2000
+#   python3 project1_benchmark.py load --rows 300000 --clients 1 --requests 4 --quoting all
+#
+# Check: CSVs that are easy to split wrongly (a stray " inside an unquoted field like 32" TV, quoted
+# fields spanning lines, "" escapes, CRLF, every field quoted) through the streamed mode at tiny chunk sizes and the parallel
+# mode cut into many small ranges, compared with the buffered mode (plain csv.DictReader).
+# Exit status 1 when they disagree.
+#   python3 project1_benchmark.py check --rows 2000
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from fractions import Fraction
+from io import BytesIO, StringIO
+
+import httpx
+
+import project1
+from project1 import ConversionState, convert_parallel, iter_csv_rows
+
+
+QUOTING = {"minimal": csv.QUOTE_MINIMAL, "all": csv.QUOTE_ALL}
+
+
+def csv_lines(rows, invalid_ratio, seed=42, quoting=csv.QUOTE_MINIMAL):
+    """The lines of a CSV upload with `rows` records, roughly `invalid_ratio` of them breaking one rule."""
+    rng = random.Random(seed)
+    out = StringIO()
+    writer = csv.writer(out, lineterminator="\n", quoting=quoting)
+    writer.writerow(["id", "amount", "type", "date"])
+    yield out.getvalue()
+    for i in range(rows):
+        out.seek(0)
+        out.truncate()
+        amount = f"{rng.uniform(0.01, 5000):.2f}"
+        kind = rng.choice(("debit", "credit"))
+        day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        if rng.random() < invalid_ratio:
+            broken = rng.randrange(3)
+            if broken == 0:
+                amount = rng.choice(("-5", "0", "abc", ""))
+            elif broken == 1:
+                kind = "transfer"
+            else:
+                writer.writerow([f"T{i}", amount])  # short row: type and date missing
+                yield out.getvalue()
+                continue
+        writer.writerow([f"T{i}", amount, kind, day])
+        yield out.getvalue()
+
+
+def make_csv(rows, invalid_ratio, seed=42, quoting=csv.QUOTE_MINIMAL):
+    """The whole CSV upload as one string (quoting=csv.QUOTE_ALL: every field in quotes)."""
+    return "".join(csv_lines(rows, invalid_ratio, seed, quoting))
+
+
+def time_validator(validator, text, repeat, aggregation="float"):
+    """Best of `repeat` runs: parse + validate + aggregate the whole CSV."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        state = ConversionState(validator, aggregation)
+        state.add_rows(csv.DictReader(StringIO(text)))
+        state.to_response("bench.csv")
+        best = min(best, time.perf_counter() - start)
+    return best, state
+
+
+def run_validate_benchmark(args):
+    text = make_csv(args.rows, args.invalid)
+    print(f"Validating {args.rows} rows ({len(text) / 1e6:.1f} MB, ~{args.invalid:.0%} invalid), best of {args.repeat}")
+    print(f"{'validator':<10} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    print("-" * 42)
+
+    results = {}
+    for validator in ("pydantic", "columnar"):
+        seconds, state = time_validator(validator, text, args.repeat)
+        results[validator] = (seconds, state.to_response("bench.csv"))
+        speedup = results["pydantic"][0] / seconds
+        print(f"{validator:<10} {seconds:>9.3f} {args.rows / seconds:>12,.0f} {speedup:>7.1f}x")
+
+    # Faster is worthless if the answer changes
+    assert results["pydantic"][1] == results["columnar"][1], "validators disagree!"
+    print("Responses identical:", results["columnar"][1].aggregated_data)
+
+
+async def max_loop_stall(work, interval=0.01):
+    """Run the `work` coroutine while a ticker measures how late the event loop wakes it up."""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        while not done:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            worst = max(worst, loop.time() - start - interval)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)  # let the ticker start before the work
+    start = time.perf_counter()
+    try:
+        result = await work
+    finally:
+        done = True
+        await tick
+    return time.perf_counter() - start, worst, result
+
+
+async def convert_in_loop(data, validator):
+    # What the buffered mode does: everything inside the coroutine
+    state = ConversionState(validator)
+    state.add_rows(csv.DictReader(StringIO(data.decode("utf-8"))))
+    return state
+
+
+def run_parallel_benchmark(args):
+    project1.PARALLEL_WORKERS = args.workers
+    project1.PARALLEL_MIN_RANGE = 1  # split even a small benchmark file
+    data = make_csv(args.rows, args.invalid, quoting=QUOTING[args.quoting]).encode()
+    print(f"Converting {args.rows} rows ({len(data) / 1e6:.1f} MB, quoting={args.quoting}) with the "
+          f"{args.validator} validator, {args.workers} worker processes")
+
+    async def main():
+        # Warm the pool up first, process start-up is not what we want to measure
+        await convert_parallel(BytesUpload(data[:1000]), args.validator)
+        single = await max_loop_stall(convert_in_loop(data, args.validator))
+        parallel = await max_loop_stall(convert_parallel(BytesUpload(data), args.validator))
+        return single, parallel
+
+    (t1, stall1, state1), (t2, stall2, state2) = asyncio.run(main())
+    print(f"{'mode':<10} {'seconds':>9} {'rows/s':>12} {'max loop stall':>16}")
+    print("-" * 50)
+    print(f"{'in-loop':<10} {t1:>9.3f} {args.rows / t1:>12,.0f} {stall1 * 1000:>13.1f} ms")
+    print(f"{'parallel':<10} {t2:>9.3f} {args.rows / t2:>12,.0f} {stall2 * 1000:>13.1f} ms")
+    print(f"Speedup {t1 / t2:.1f}x")
+
+    assert (state1.total_count, state1.valid_count) == (state2.total_count, state2.valid_count)
+    print("Counts identical, debit totals:", round(state1.total_debit_amount, 2), round(state2.total_debit_amount, 2))
+
+
+def run_aggregate_benchmark(args):
+    text = make_csv(args.rows, args.invalid)
+    # The true debit total, straight from the text: every generated amount has 2 decimals
+    exact_debits = Fraction(0)
+    for row in csv.DictReader(StringIO(text)):
+        state = ConversionState()
+        state.add_rows([row])
+        if state.valid_count and row["type"] == "debit":
+            exact_debits += Fraction(row["amount"])
+
+    print(f"Aggregating {args.rows} rows, best of {args.repeat}")
+    print(f"{'validator':<10} {'aggregation':<12} {'seconds':>9} {'rows/s':>12} {'debit total - true total':>26}")
+    print("-" * 73)
+    for validator in ("pydantic", "columnar"):
+        for aggregation in ("float", "exact"):
+            seconds, state = time_validator(validator, text, args.repeat, aggregation)
+            error = Fraction(state.total_debit_amount) - exact_debits
+            print(f"{validator:<10} {aggregation:<12} {seconds:>9.3f} {args.rows / seconds:>12,.0f} {float(error):>26.3e}")
+
+
+def run_output_benchmark(args):
+    text = make_csv(args.rows, args.invalid)
+    batches = []
+    rows = csv.DictReader(StringIO(text))
+    while batch := list(itertools.islice(rows, project1.BATCH_SIZE)):
+        batches.append(project1.RecordBatch(batch))
+    valid = sum(int(batch.valid.sum()) for batch in batches)
+
+    print(f"{valid} valid records out of {args.rows} rows ({len(text) / 1e6:.1f} MB of CSV)")
+    print(f"{'format':<8} {'MB':>8} {'write s':>9} {'read s':>9}  read = total of the amount column")
+    print("-" * 70)
+
+    formats = ["ndjson", "frc"] + (["arrow"] if project1.HAS_ARROW else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        for output_format in formats:
+            path = os.path.join(tmp, f"records.{output_format}")
+            start = time.perf_counter()
+            with open(path, "wb") as out:
+                if output_format == "ndjson":
+                    for batch in batches:
+                        out.write(b"".join(json.dumps(record).encode() + b"\n" for record in batch.valid_records()))
+                else:
+                    encoder = project1.make_encoder(output_format)
+                    out.write(encoder.start())
+                    for batch in batches:
+                        out.write(encoder.encode(batch))
+                    out.write(encoder.finish())
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if output_format == "ndjson":
+                with open(path, "rb") as f:
+                    total = sum(json.loads(line)["amount"] for line in f)
+            elif output_format == "frc":
+                total = sum(float(columns["amount"].sum()) for columns in project1.read_frc(path))
+            else:
+                with project1.pa.memory_map(path) as source:
+                    table = project1.pa.ipc.open_stream(source).read_all()
+                total = sum(float(chunk.to_numpy().sum()) for chunk in table.column("amount").chunks)
+            read_seconds = time.perf_counter() - start
+            print(f"{output_format:<8} {os.path.getsize(path) / 1e6:>8.1f} {write_seconds:>9.3f} {read_seconds:>9.3f}  {total:,.2f}")
+
+
+MEMOS = ["plain", '32" TV', 'x"y"z', '"quoted, with a comma"', '"two\nlines"', '"say ""hi"""',
+         '"closed"then', "", "é€ unicode"]
+
+
+def tricky_csv(rows, seed=7, newline="\n"):
+    """Valid and invalid records with a memo column full of quoting edge cases."""
+    rng = random.Random(seed)
+    lines = ["id,amount,type,date,memo"]
+    for i in range(rows):
+        amount = rng.choice(("12.50", "0", "abc", f"{rng.uniform(0.01, 5000):.2f}"))
+        kind = rng.choice(("debit", "credit", "transfer"))
+        lines.append(f"T{i},{amount},{kind},2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},{rng.choice(MEMOS)}")
+    return newline.join(lines) + newline
+
+
+class BytesUpload:
+    """UploadFile.read(size) over bytes already in memory."""
+
+    def __init__(self, data):
+        self.data = BytesIO(data)
+
+    async def read(self, size=-1):
+        return self.data.read(size)
+
+
+def run_check(args):
+    failures = 0
+    cases = [("\\n", tricky_csv(args.rows)), ("\\r\\n", tricky_csv(args.rows, newline="\r\n")),
+             ("quote-all", make_csv(args.rows, 0.1, quoting=csv.QUOTE_ALL))]
+    for case, text in cases:
+        expected = ConversionState()
+        expected.add_rows(csv.DictReader(StringIO(text)))
+        expected = expected.to_response("check.csv")
+
+        for chunk_size in (1, 7, 64, 4096, project1.CSV_CHUNK_SIZE):
+            async def streamed():
+                state = ConversionState()
+                async for rows in iter_csv_rows(BytesUpload(text.encode()), chunk_size):
+                    state.add_rows(rows)
+                return state.to_response("check.csv")
+
+            ok = asyncio.run(streamed()) == expected
+            failures += not ok
+            print(f"stream   {case:<9} chunk={chunk_size:<8} {'ok' if ok else 'MISMATCH'}")
+
+        for ranges in (2, 7, 31):
+            project1.PARALLEL_WORKERS = ranges
+            project1.PARALLEL_MIN_RANGE = 1
+            state = asyncio.run(convert_parallel(BytesUpload(text.encode()), "pydantic"))
+            ok = state.to_response("check.csv") == expected
+            failures += not ok
+            print(f"parallel {case:<9} ranges={ranges:<7} {'ok' if ok else 'MISMATCH'}")
+    if project1.process_pool is not None:
+        project1.process_pool.shutdown()
+    print(f"{expected.total_records} records per file, {failures} mismatches")
+    if failures:
+        sys.exit(1)
+
+
+class SyntheticUpload:
+    """Quacks like UploadFile.read(size) but generates the CSV as it is read, never holding it all."""
+
+    def __init__(self, rows, invalid_ratio):
+        self.lines = csv_lines(rows, invalid_ratio)
+        self.pending = b""
+        self.size = 0
+
+    async def read(self, size):
+        parts = [self.pending]
+        have = len(self.pending)
+        for line in self.lines:
+            data = line.encode()
+            parts.append(data)
+            have += len(data)
+            if have >= size:
+                break
+        data = b"".join(parts)
+        self.pending = data[size:]
+        self.size += min(size, len(data))
+        return data[:size]
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+
+
+def memory_run(rows, invalid_ratio, validator, results):
+    """Child process: stream `rows` rows through the converter, report the peak RSS."""
+    async def convert(n):
+        upload = SyntheticUpload(n, invalid_ratio)
+        state = ConversionState(validator)
+        async for batch in iter_csv_rows(upload):
+            state.add_rows(batch)
+        return upload.size, state.to_response("bench.csv")
+
+    asyncio.run(convert(50_000))  # warm-up: imports, caches and a couple of full-chunk buffers
+    before = peak_rss_kb()
+    start = time.perf_counter()
+    size, response = asyncio.run(convert(rows))
+    results.put((size, time.perf_counter() - start, before, peak_rss_kb(), response.valid_records))
+
+
+def run_memory_benchmark(args):
+    # spawn: every size starts from a clean interpreter, ru_maxrss never goes down
+    ctx = multiprocessing.get_context("spawn")
+    print(f"Streaming conversions with the {args.validator} validator, one fresh process per size")
+    print(f"{'rows':>10} {'input MB':>9} {'seconds':>8} {'valid':>10} {'peak RSS MB':>12} {'growth MB':>10}")
+    print("-" * 64)
+    for rows in [int(r) for r in args.rows.split(",")]:
+        results = ctx.Queue()
+        child = ctx.Process(target=memory_run, args=(rows, args.invalid, args.validator, results))
+        child.start()
+        size, seconds, before, peak, valid = results.get()
+        child.join()
+        print(f"{rows:>10} {size / 1e6:>9.1f} {seconds:>8.2f} {valid:>10} {peak / 1024:>12.1f} "
+              f"{(peak - before) / 1024:>10.1f}")
+
+
+async def drive_convert(client, query, data, clients, requests):
+    """`clients` concurrent clients sharing `requests` uploads, each sent as soon as the previous one answered."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def one_client():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"/api/convert?{query}", files={"csv_file": ("bench.csv", data, "text/csv")})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one_client() for _ in range(clients)])
+    return latencies, errors, time.perf_counter() - start
+
+
+def load_run(mode, args, results):
+    """Child process: the app (in-process) plus the clients, one ingestion mode."""
+    data = make_csv(args.rows, args.invalid, quoting=QUOTING[args.quoting]).encode()
+    query = f"mode={mode}&validator={args.validator}&aggregation={args.aggregation}"
+
+    async def main():
+        if args.url:
+            transport, base_url = None, args.url
+        else:
+            transport, base_url = httpx.ASGITransport(app=project1.app), "http://bench"
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=None) as client:
+            await drive_convert(client, query, data, 1, 1)  # warm-up: imports, pools, caches
+            before = peak_rss_kb()
+            latencies, errors, duration = await drive_convert(client, query, data, args.clients, args.requests)
+            return latencies, errors, duration, before
+
+    latencies, errors, duration, before = asyncio.run(main())
+    if project1.process_pool:
+        # A multiprocessing child joins its own children before the pool's atexit hook could stop them
+        project1.process_pool.shutdown()
+    results.put((latencies, errors, duration, len(data), before, peak_rss_kb()))
+
+
+def run_load_benchmark(args):
+    ctx = multiprocessing.get_context("spawn")
+    where = args.url or "in-process ASGI"
+    print(f"{args.requests} uploads of {args.rows} rows (~{args.invalid:.0%} invalid, quoting={args.quoting}) from "
+          f"{args.clients} clients to {where}, validator={args.validator}, aggregation={args.aggregation}")
+    if args.url:
+        print("(peak RSS is the client process: the server runs elsewhere)")
+    print(f"{'mode':<10} {'ok':>5} {'errors':>6} {'req/s':>7} {'rows/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+    print("-" * 76)
+
+    failed = []
+    for mode in args.modes.split(","):
+        results = ctx.Queue()
+        child = ctx.Process(target=load_run, args=(mode, args, results))
+        child.start()
+        latencies, errors, duration, size, before, peak = results.get()
+        child.join()
+
+        if len(latencies) >= 2:
+            q = statistics.quantiles(latencies, n=100)
+            p50, p99 = q[49] * 1000, q[98] * 1000
+        else:
+            p50 = p99 = float("nan")
+        rows_per_second = len(latencies) * args.rows / duration
+        print(f"{mode:<10} {len(latencies):>5} {errors:>6} {len(latencies) / duration:>7.1f} {rows_per_second:>11,.0f} "
+              f"{p50:>9.1f} {p99:>9.1f} {peak / 1024:>12.1f}")
+
+        if errors or (args.max_p99_ms and not p99 <= args.max_p99_ms) or \
+                (args.min_rows_per_second and rows_per_second < args.min_rows_per_second):
+            failed.append(mode)
+
+    if failed:
+        print(f"FAILED: {', '.join(failed)} missed the limits (or had errors)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV converter benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    validate = sub.add_parser("validate", help="per-row Pydantic vs columnar batch validation")
+    validate.add_argument("--rows", type=int, default=200_000)
+    validate.add_argument("--invalid", type=float, default=0.1, help="fraction of rows breaking a rule")
+    validate.add_argument("--repeat", type=int, default=3)
+
+    parallel = sub.add_parser("parallel", help="one big upload: in the event loop vs the process pool")
+    parallel.add_argument("--rows", type=int, default=1_000_000)
+    parallel.add_argument("--invalid", type=float, default=0.1)
+    parallel.add_argument("--workers", type=int, default=project1.PARALLEL_WORKERS)
+    parallel.add_argument("--validator", choices=["pydantic", "columnar"], default="columnar")
+    parallel.add_argument("--quoting", choices=list(QUOTING), default="minimal", help="all: every field in quotes")
+
+    memory = sub.add_parser("memory", help="peak RSS of a streamed conversion as the input grows")
+    memory.add_argument("--rows", default="10000,100000,1000000", help="comma separated input sizes")
+    memory.add_argument("--invalid", type=float, default=0.1)
+    memory.add_argument("--validator", choices=["pydantic", "columnar"], default="columnar")
+
+    aggregate = sub.add_parser("aggregate", help="float vs exact debit/credit totals")
+    aggregate.add_argument("--rows", type=int, default=1_000_000)
+    aggregate.add_argument("--invalid", type=float, default=0.1)
+    aggregate.add_argument("--repeat", type=int, default=2)
+
+    output = sub.add_parser("output", help="NDJSON vs columnar binary output: size, write and read time")
+    output.add_argument("--rows", type=int, default=500_000)
+    output.add_argument("--invalid", type=float, default=0.1)
+
+    load = sub.add_parser("load", help="concurrent clients against /api/convert, per ingestion mode")
+    load.add_argument("--modes", default="stream,buffered,parallel", help="any of stream, buffered, parallel")
+    load.add_argument("--rows", type=int, default=50_000, help="rows per uploaded CSV")
+    load.add_argument("--invalid", type=float, default=0.1)
+    load.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    load.add_argument("--requests", type=int, default=64, help="uploads in total, per mode")
+    load.add_argument("--validator", choices=["pydantic", "columnar"], default="pydantic")
+    load.add_argument("--aggregation", choices=["float", "exact"], default="float")
+    load.add_argument("--quoting", choices=list(QUOTING), default="minimal", help="all: every field in quotes")
+    load.add_argument("--url", default=None, help="base URL of a running server instead of the in-process app")
+    load.add_argument("--max-p99-ms", type=float, default=None, help="fail if any mode's p99 latency is above")
+    load.add_argument("--min-rows-per-second", type=float, default=None, help="fail if any mode is slower")
+
+    check = sub.add_parser("check", help="tricky quoting through every ingestion mode, must match buffered")
+    check.add_argument("--rows", type=int, default=2000)
+
+    args = parser.parse_args()
+    if args.benchmark == "validate":
+        run_validate_benchmark(args)
+    elif args.benchmark == "parallel":
+        run_parallel_benchmark(args)
+    elif args.benchmark == "memory":
+        run_memory_benchmark(args)
+    elif args.benchmark == "aggregate":
+        run_aggregate_benchmark(args)
+    elif args.benchmark == "output":
+        run_output_benchmark(args)
+    elif args.benchmark == "load":
+        run_load_benchmark(args)
+    elif args.benchmark == "check":
+        run_check(args)
@@ -5,94 +5,132 @@
 # Technical RequirementsLanguage & Libraries: Python 3.9+, standard libraries (requests, concurrent.futures, multiprocessing), 
 # and OOD principles.Design Paradigm: Strict adherence to Object-Oriented Programming (OOP) using classes for Scraper, Analyzer, and the overall Manager.
 
+import os
+import math
+import random
+import re
+import struct
 import time
+import heapq
+import itertools
+import asyncio
+import gzip
+import hashlib
+import ssl
+import zlib
 import requests
 import numpy
-from typing import List, Optional
-from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import asdict, dataclass
+from urllib.parse import urldefrag, urljoin, urlsplit, urlunsplit
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from bs4 import BeautifulSoup
+from html import unescape
+from html.parser import HTMLParser
 import multiprocessing
 import json
+import tempfile
+import threading
+
+# faster parser backends for the extraction stage, used when installed
+try:
+    import lxml.etree
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser  # selectolax < 0.3 only has modest
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
 
 # i need to first learn how to use the requests library
+# (moved into a function so importing this file doesn't hit the network - the async engine
+# below gets tested against a local server, call requests_playground() to rerun the exploration)
+def requests_playground():
+    # A get request to 'https://w3schools.com/python/demopage.htm'
+    x = requests.get('https://w3schools.com/python/demopage.htm')
+    print(f"Text: {x.text} \n Status: {x.status_code} \n JSON: {x.json}")
 
-# A get request to 'https://w3schools.com/python/demopage.htm'
-x = requests.get('https://w3schools.com/python/demopage.htm')
-print(f"Text: {x.text} \n Status: {x.status_code} \n JSON: {x.json}")
+    jumia = requests.get('https://www.jumia.com.ng/televisions/#catalog-listing')
 
-jumia = requests.get('https://www.jumia.com.ng/televisions/#catalog-listing')
+    print("=" * 40)
 
-print("=" * 40)
+    # The syntax: "requests.methodname(params)"
+    # Method	                    |  Description
+    # delete(url, args)	            |  Sends a DELETE request to the specified url
+    # get(url, params, args)	    |  Sends a GET request to the specified url
+    # head(url, args)	            |  Sends a HEAD request to the specified url
+    # patch(url, data, args)	    |  Sends a PATCH request to the specified url
+    # post(url, data, json, args)	|  Sends a POST request to the specified url
+    # put(url, data, args)	        |  Sends a PUT request to the specified url
+    # request(method, url, args)	|  Sends a request of the specified method to the specified url
 
-# The syntax: "requests.methodname(params)"
-# Method	                    |  Description
-# delete(url, args)	            |  Sends a DELETE request to the specified url
-# get(url, params, args)	    |  Sends a GET request to the specified url
-# head(url, args)	            |  Sends a HEAD request to the specified url
-# patch(url, data, args)	    |  Sends a PATCH request to the specified url
-# post(url, data, json, args)	|  Sends a POST request to the specified url
-# put(url, data, args)	        |  Sends a PUT request to the specified url
-# request(method, url, args)	|  Sends a request of the specified method to the specified url
+    # I need to learn how to use beautifulsoup4
 
-# I need to learn how to use beautifulsoup4
+    # A simple soup instance for web scrapping
+    soup = BeautifulSoup(jumia.text, 'html.parser')
 
-# A simple soup instance for web scrapping
-soup = BeautifulSoup(jumia.text, 'html.parser')
+    products = []
 
-products = []
+    # Get ALL product elements first
+    all_products = soup.find_all('article', class_='prd _box _hvr')  # Adjust selector based on actual HTML
 
-# Get ALL product elements first
-all_products = soup.find_all('article', class_='prd _box _hvr')  # Adjust selector based on actual HTML
+    limit = 10  # Show only first 10 products
+    limited_products = all_products[:limit]
 
-limit = 10  # Show only first 10 products
-limited_products = all_products[:limit]
+    print(f"Found {len(all_products)} total products, showing {len(limited_products)}")
 
-print(f"Found {len(all_products)} total products, showing {len(limited_products)}")
+    # Debug: Check what attributes the core link has
+    if limited_products:
+        first_core_link = limited_products[0].find('a', class_='core')
+        if first_core_link:
+            print("\n=== DEBUG: CORE LINK ATTRIBUTES ===")
+            print(f"Tag: {first_core_link.name}")
+            print(f"All attributes: {first_core_link.attrs}")
+            print(f"Has 'href'? {'href' in first_core_link.attrs}")
 
-# Debug: Check what attributes the core link has
-if limited_products:
-    first_core_link = limited_products[0].find('a', class_='core')
-    if first_core_link:
-        print("\n=== DEBUG: CORE LINK ATTRIBUTES ===")
-        print(f"Tag: {first_core_link.name}")
-        print(f"All attributes: {first_core_link.attrs}")
-        print(f"Has 'href'? {'href' in first_core_link.attrs}")
-        
-        # Check all attributes that might contain a link
-        for attr_name, attr_value in first_core_link.attrs.items():
-            print(f"  {attr_name}: {attr_value}")
-
-print("\n=== EXTRACTED PRODUCTS ===")
-for i, product in enumerate(limited_products, 1):
-    # Find the <a class="core"> element inside the product
-    core_link = product.find('a', class_='core')
-    
-    # Extract name from data attribute
-    if core_link:
-        name = core_link.get('data-ga4-item_name', 'No name found')
-        # Try to get the link - check the 'href' attribute
-        link = core_link.get('href', 'No link found')
-    else:
-        name = "No name found"
-        link = "No link found"
-    
-    # Extract price
-    product_price_element = product.find("div", class_="prc")
-    price = product_price_element.text.strip() if product_price_element else "No price found"
-    
-    # Also try finding ANY link in the product
-    if link == "No link found":
-        any_link = product.find('a')
-        if any_link:
-            link = any_link.get('href', 'No link found')
-    
-    print(f"{i}. Name: {name}")
-    print(f"   Price: {price}")
-    print(f"   Link: {link}")
-    print("-" * 40)
+            # Check all attributes that might contain a link
+            for attr_name, attr_value in first_core_link.attrs.items():
+                print(f"  {attr_name}: {attr_value}")
 
-print("=" * 40)
+    print("\n=== EXTRACTED PRODUCTS ===")
+    for i, product in enumerate(limited_products, 1):
+        # Find the <a class="core"> element inside the product
+        core_link = product.find('a', class_='core')
+
+        # Extract name from data attribute
+        if core_link:
+            name = core_link.get('data-ga4-item_name', 'No name found')
+            # Try to get the link - check the 'href' attribute
+            link = core_link.get('href', 'No link found')
+        else:
+            name = "No name found"
+            link = "No link found"
+
+        # Extract price
+        product_price_element = product.find("div", class_="prc")
+        price = product_price_element.text.strip() if product_price_element else "No price found"
+
+        # Also try finding ANY link in the product
+        if link == "No link found":
+            any_link = product.find('a')
+            if any_link:
+                link = any_link.get('href', 'No link found')
+
+        print(f"{i}. Name: {name}")
+        print(f"   Price: {price}")
+        print(f"   Link: {link}")
+        print("-" * 40)
+
+    print("=" * 40)
 
 # PROJECT: Concurrent Web Scraper and Data Analyzer (Python OOD)
 
@@ -113,15 +151,24 @@ class ProductData:
     price: float
     url: str
 
+PRODUCT_LIMIT = 10  # products kept per page, None = all of them
+
 class ProductScrapper():
-    def __init__(self, url_list: List[str]):
+    def __init__(self, url_list: List[str], cache: Optional["PageCache"] = None,
+                 extractor: Optional["ExtractionPool"] = None, verbose: bool = True,
+                 product_limit: Optional[int] = PRODUCT_LIMIT):
         # i feel like i should have used BaseModel to handle this thing, but lets keep going..
         self.url_list = url_list
+        self.cache = cache  # optional on-disk PageCache, makes re-crawls conditional
+        self.extractor = extractor  # optional ExtractionPool, parses in worker processes on the async path
+        self.verbose = verbose  # False = don't print every product (long crawls)
+        self.product_limit = product_limit  # None = every product on the page (the crawl wants all of them)
     
     def fetch_data(self, url: str) -> Optional[List[ProductData]]:
         """Fetch data from a single URL"""
         try:
-            response = requests.get(url, timeout=5)
+            entry, headers = self.conditional_headers(url)
+            response = requests.get(url, timeout=5, headers=headers)
             time.sleep(1)
             response.raise_for_status() # raise exception for bad status codes
             
@@ -133,62 +180,762 @@ class ProductScrapper():
             #     url=url
             # )
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response_headers = {k.lower(): v for k, v in response.headers.items()}
+            cached = self.cached_products(url, entry, response.status_code, response_headers, response.content)
+            if cached is not None:
+                return cached
+            products_data = self.parse_products(response.text, url)
+            self.store_products(url, response.status_code, response_headers, response.content, response.text, products_data)
+            return self.keep_products(products_data)  # Return list of products
             
-            products_data = []
-
-            # Get ALL product elements first
-            all_products = soup.find_all('article', class_='prd _box _hvr')  # Adjust selector based on actual HTML
+        except requests.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+            return None
 
-            limit = 10  # Show only first 10 products
-            limited_products = all_products[:limit]
+    async def fetch_data_async(self, fetcher: "AsyncFetcher", url: str) -> Optional[List[ProductData]]:
+        """Same as fetch_data but over the shared keep-alive pool, no sleep - the fetcher's token bucket paces us"""
+        fetched = await self.fetch_page(fetcher, url)
+        if fetched is None:
+            return None
+        response, cached = fetched
+        if cached is not None:
+            return cached
+        return await self.parse_page(url, response)
 
-            print(f"Found {len(all_products)} total products, showing {len(limited_products)}")
-            
-            for i, product in enumerate(limited_products, 1):
-                # Find the <a class="core"> element inside the product
-                core_link = product.find('a', class_='core')
-                
-                # Method 1: Get name & link from data attribute (already a string)
-                if core_link:
-                    name = core_link.get('data-ga4-item_name', 'No name found')
-                    relative_link = core_link.get('href', '')
-                    full_link = f"https://www.jumia.com.ng{relative_link}" if relative_link else url
-                else:
-                    name = "No name found"
-                    full_link = url
-                    
-                # Method 2: Clean up the price (extract text from element)
-                product_price_element = product.find("div", class_="prc")
-                price = product_price_element.text.strip() if product_price_element else "No price found"
-                
-                # Convert price text to float (remove currency symbols and commas)
-                try:
-                    # Extract numbers from price string like "₦ 129,000"
-                    price_value = float(price.replace('₦', '').replace(',', '').strip())
-                except (ValueError, AttributeError):
-                    price_value = 0.0
-                
-                
-                print(f"{i}. Name: {name}")
-                print(f"   Price: {price_value}")
-                
-                # Create ProductData object for each product
-                product_data = ProductData(
-                    title=name,
-                    price=price_value,
-                    url=full_link
-                )
-                products_data.append(product_data)
-                
-                print(f"[Scraper] {i}. {name[:50]}... - ₦{price_value:,.2f}")
-            
-            return products_data  # Return list of products
-            
-        except requests.RequestException as e:
+    # fetch_data_async in two halves, so the pipeline (CrawlPipeline) can run them as separate stages
+    async def fetch_page(self, fetcher: "AsyncFetcher", url: str) -> Optional[Tuple["FetchResponse", Optional[List[ProductData]]]]:
+        """The response, plus the cached products when the cache says the page didn't change (None on errors)"""
+        entry, headers = self.conditional_headers(url)
+        try:
+            response = await fetcher.fetch(url, headers=headers)
+            response.raise_for_status()
+        except (FetchError, OSError, asyncio.TimeoutError) as e:
             print(f"Error fetching {url}: {e}")
             return None
-        
+        return response, self.cached_products(url, entry, response.status, response.headers, response.body)
+
+    async def parse_page(self, url: str, response: "FetchResponse") -> List[ProductData]:
+        if self.extractor is not None:
+            products_data = await self.extractor.parse(response.text, response.url, self.parse_limit())
+        else:
+            products_data = self.parse_products(response.text, response.url)
+        self.store_products(url, response.status, response.headers, response.body, response.text, products_data)
+        return self.keep_products(products_data)
+
+    # Conditional requests: send back the ETag / Last-Modified we saw last time, on a 304 (or a 200 whose
+    # body hashes the same as before) we hand back the products parsed last time and skip the soup entirely
+    def conditional_headers(self, url: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        entry = self.cache.get(url) if self.cache else None
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return entry, headers
+
+    def cached_products(self, url: str, entry: Optional[Dict[str, Any]], status: int,
+                        headers: Dict[str, str], body: bytes) -> Optional[List[ProductData]]:
+        if entry is None:
+            return None
+        if status == 304:
+            self.cache.count_hit(not_modified=True)
+        elif status == 200 and hashlib.sha256(body).hexdigest() == entry["sha256"]:
+            self.cache.count_hit(not_modified=False)
+        else:
+            return None
+        self.cache.refresh(url, entry, headers)
+        return self.limit_products([ProductData(**p) for p in entry["products"]])
+
+    def store_products(self, url: str, status: int, headers: Dict[str, str], body: bytes, html: str,
+                       products: List[ProductData]):
+        if self.cache is not None and status == 200:
+            # the pagination links go in too, a 304 has no body to find them in
+            self.cache.put(url, headers, body, products, extract_pagination_links(html, url))
+
+    def pagination_links(self, url: str, response: "FetchResponse") -> List[str]:
+        """The catalog's other pages linked from this one (from the cache entry when the server said 304)"""
+        if response.status == 304:
+            entry = self.cache.get(url) if self.cache else None
+            return entry.get("links", []) if entry else []
+        return extract_pagination_links(response.text, response.url)
+
+    def parse_products(self, html: str, url: str) -> List[ProductData]:
+        """Pull the product cards out of one catalog page (shared by the sync and async paths)"""
+        return extract_products(html, url, limit=self.parse_limit())
+
+    # The cache entry always holds every product on the page and the limit is applied on the way out,
+    # otherwise a scraper keeping 10 per page would leave truncated entries behind for the crawl (limit None)
+    def parse_limit(self) -> Optional[int]:
+        return None if self.cache is not None else self.product_limit
+
+    def limit_products(self, products_data: List[ProductData]) -> List[ProductData]:
+        return products_data if self.product_limit is None else products_data[:self.product_limit]
+
+    def keep_products(self, products_data: List[ProductData]) -> List[ProductData]:
+        products_data = self.limit_products(products_data)
+        self.report_products(products_data)
+        return products_data
+
+    def report_products(self, products_data: List[ProductData]):
+        if not self.verbose:
+            return
+        print(f"Found {len(products_data)} products" + (f" (first {self.product_limit} per page)" if self.product_limit else ""))
+        for i, product in enumerate(products_data, 1):
+            print(f"[Scraper] {i}. {product.title[:50]}... - ₦{product.price:,.2f}")
+
+
+# Extraction
+# Parsing used to happen inside fetch_data, so in the threaded scraper BeautifulSoup's pure Python tree
+# building fought the network threads for the GIL. Now it's its own stage: extract_products(html, url)
+# is a plain function (so it pickles) and ExtractionPool runs it in worker processes.
+# Backends, all returning the same ProductData lists:
+# - selectolax / lxml: C parsers, used when installed
+# - stream: html.parser tokenizer that only keeps state inside the product <article>s and stops at the limit,
+#   never builds a tree (stdlib only, the fallback)
+# - bs4: the original soup code, kept for comparison
+# SCRAPER_PARSER picks one explicitly.
+
+PRODUCT_CLASS = "prd _box _hvr"  # class_='prd _box _hvr' in bs4 matches the whole attribute exactly
+EXTRACT_WORKERS = os.cpu_count() or 1
+EXTRACT_BATCH = 16               # pages per task sent to a worker, amortises the pickling round trip
+
+
+def parse_price(price: Optional[str]) -> float:
+    # Convert price text to float (remove currency symbols and commas)
+    try:
+        # Extract numbers from price string like "₦ 129,000"
+        return float(price.replace('₦', '').replace(',', '').strip())
+    except (ValueError, AttributeError):
+        return 0.0
+
+
+def make_product(page_url: str, name: str, relative_link: Optional[str], price: Optional[str]) -> ProductData:
+    # urljoin gives the same https://www.jumia.com.ng/... links, and also works for a local test server
+    full_link = page_url
+    if relative_link:
+        try:
+            full_link = urljoin(page_url, relative_link)
+        except ValueError:
+            pass  # malformed href ("http://[oops/x"), same fallback as a missing link
+    return ProductData(title=name, price=parse_price(price), url=full_link)
+
+
+def extract_bs4(html: str, url: str, limit: Optional[int]) -> List[ProductData]:
+    soup = BeautifulSoup(html, 'html.parser')
+    products_data = []
+
+    # Get ALL product elements first
+    all_products = soup.find_all('article', class_=PRODUCT_CLASS)  # Adjust selector based on actual HTML
+
+    for product in all_products[:limit]:
+        # Find the <a class="core"> element inside the product
+        core_link = product.find('a', class_='core')
+
+        # Method 1: Get name & link from data attribute (already a string)
+        if core_link:
+            name = core_link.get('data-ga4-item_name', 'No name found')
+            relative_link = core_link.get('href', '')
+        else:
+            name = "No name found"
+            relative_link = None
+
+        # Method 2: Clean up the price (extract text from element)
+        product_price_element = product.find("div", class_="prc")
+        price = product_price_element.text.strip() if product_price_element else None
+
+        products_data.append(make_product(url, name, relative_link, price))
+    return products_data
+
+
+class StopTokenizing(Exception):
+    pass
+
+
+class ProductTokenizer(HTMLParser):
+    """Streams through the tags, only remembers what it needs inside a product article"""
+
+    def __init__(self, url: str, limit: Optional[int]):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.limit = limit
+        self.products: List[ProductData] = []
+        self.depth = 0            # nesting of <article> while inside a product, 0 = outside
+        self.core_attrs = None    # attrs of the first a.core in the current product
+        self.price_depth = 0      # nesting of <div> while inside div.prc
+        self.price_parts = None   # text of the first div.prc, None until we see one
+
+    def handle_starttag(self, tag, attrs):
+        if not self.depth:
+            if tag == "article" and dict(attrs).get("class") == PRODUCT_CLASS:
+                self.depth = 1
+                self.core_attrs = None
+                self.price_parts = None
+            return
+        if tag == "article":
+            self.depth += 1
+        elif tag == "a" and self.core_attrs is None:
+            attrs = {k: v or "" for k, v in attrs}
+            if "core" in attrs.get("class", "").split():
+                self.core_attrs = attrs
+        elif tag == "div":
+            if self.price_depth:
+                self.price_depth += 1
+            elif self.price_parts is None and "prc" in (dict(attrs).get("class") or "").split():
+                self.price_depth = 1
+                self.price_parts = []
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag == "div" and self.price_depth:
+            self.price_depth -= 1
+        elif tag == "article":
+            self.depth -= 1
+            if not self.depth:
+                self.finish_product()
+
+    def handle_data(self, data):
+        if self.price_depth:
+            self.price_parts.append(data)
+
+    def finish_product(self):
+        self.price_depth = 0
+        if self.core_attrs is not None:
+            name = self.core_attrs.get("data-ga4-item_name", "No name found")
+            relative_link = self.core_attrs.get("href", "")
+        else:
+            name = "No name found"
+            relative_link = None
+        price = "".join(self.price_parts).strip() if self.price_parts is not None else None
+        self.products.append(make_product(self.url, name, relative_link, price))
+        if self.limit is not None and len(self.products) >= self.limit:
+            raise StopTokenizing
+
+
+def extract_stream(html: str, url: str, limit: Optional[int]) -> List[ProductData]:
+    if limit is not None and limit <= 0:
+        return []
+    start = html.find("<article")  # the header / nav / scripts before the first card can't hold products
+    if start < 0:
+        return []
+    tokenizer = ProductTokenizer(url, limit)
+    try:
+        tokenizer.feed(html[start:])
+        tokenizer.close()
+    except StopTokenizing:
+        pass
+    return tokenizer.products
+
+
+PARSER_BACKENDS = {"bs4": extract_bs4, "stream": extract_stream}
+
+if HAS_LXML:
+    LXML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+    def extract_lxml(html: str, url: str, limit: Optional[int]) -> List[ProductData]:
+        if not html.strip():
+            return []
+        # bytes + explicit encoding, lxml refuses str input that carries its own encoding declaration
+        try:
+            root = lxml.html.fromstring(html.encode("utf-8"), parser=LXML_PARSER)
+        except lxml.etree.ParserError:
+            return []  # "Document is empty": only a comment or an xml declaration, no elements at all
+        products_data = []
+        for product in root.iter("article"):
+            if product.get("class") != PRODUCT_CLASS:
+                continue
+            if limit is not None and len(products_data) >= limit:
+                break
+            core_link = next((a for a in product.iter("a") if "core" in (a.get("class") or "").split()), None)
+            if core_link is not None:
+                name = core_link.get("data-ga4-item_name", "No name found")
+                relative_link = core_link.get("href", "")
+            else:
+                name = "No name found"
+                relative_link = None
+            price_element = next((d for d in product.iter("div") if "prc" in (d.get("class") or "").split()), None)
+            price = price_element.text_content().strip() if price_element is not None else None
+            products_data.append(make_product(url, name, relative_link, price))
+        return products_data
+
+    PARSER_BACKENDS["lxml"] = extract_lxml
+
+if HAS_SELECTOLAX:
+    def extract_selectolax(html: str, url: str, limit: Optional[int]) -> List[ProductData]:
+        products_data = []
+        for product in SelectolaxParser(html).css(f'article[class="{PRODUCT_CLASS}"]'):
+            if limit is not None and len(products_data) >= limit:
+                break
+            core_link = product.css_first("a.core")
+            if core_link is not None:
+                attrs = core_link.attributes  # valueless attributes come back as None
+                name = attrs.get("data-ga4-item_name", "No name found") or ""
+                relative_link = attrs.get("href") or ""
+            else:
+                name = "No name found"
+                relative_link = None
+            price_element = product.css_first("div.prc")
+            price = price_element.text().strip() if price_element is not None else None
+            products_data.append(make_product(url, name, relative_link, price))
+        return products_data
+
+    PARSER_BACKENDS["selectolax"] = extract_selectolax
+
+PARSER_BACKEND = os.environ.get("SCRAPER_PARSER") or next(
+    name for name in ("selectolax", "lxml", "stream") if name in PARSER_BACKENDS)
+
+
+def extract_products(html: str, url: str, backend: Optional[str] = None,
+                     limit: Optional[int] = PRODUCT_LIMIT) -> List[ProductData]:
+    backend = backend or PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"parser backend {backend!r} is not available, have {sorted(PARSER_BACKENDS)}")
+    return PARSER_BACKENDS[backend](html, url, limit)
+
+
+# Pagination links: a regex over the <a ...> tags is enough (and much cheaper than another parse),
+# only anchors whose class has PAGINATION_CLASS count
+PAGINATION_CLASS = "pg"  # Adjust selector based on actual HTML
+ANCHOR_TAG = re.compile(r"<a\s[^>]*>", re.IGNORECASE)
+TAG_ATTRIBUTE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+
+
+def extract_pagination_links(html: str, url: str) -> List[str]:
+    links = []
+    for match in ANCHOR_TAG.finditer(html):
+        tag = match.group()
+        if PAGINATION_CLASS not in tag:
+            continue
+        attrs = {m.group(1).lower(): m.group(2) or m.group(3) or m.group(4) or "" for m in TAG_ATTRIBUTE.finditer(tag)}
+        if PAGINATION_CLASS in attrs.get("class", "").split() and attrs.get("href"):
+            try:
+                links.append(urljoin(url, unescape(attrs["href"])))
+            except ValueError:
+                continue  # malformed href, skip it rather than lose the whole page
+    return links
+
+
+def extract_batch(pages: List[Tuple[str, str]], backend: Optional[str], limit: Optional[int]) -> List[List[ProductData]]:
+    """Runs in a worker: a batch of (html, url) pages -> the products of each page"""
+    return [extract_products(html, url, backend, limit) for html, url in pages]
+
+
+class ExtractionPool():
+    """Worker processes for the parsing stage, so the fetching loop / threads never wait on the GIL for it"""
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, backend: Optional[str] = None):
+        self.backend = backend or PARSER_BACKEND
+        if self.backend not in PARSER_BACKENDS:
+            raise ValueError(f"parser backend {self.backend!r} is not available, have {sorted(PARSER_BACKENDS)}")
+        # spawn, not fork: the parent may have an event loop and connection pool threads running
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    # the limit comes with every call, one pool is shared by scrapers that keep different numbers of products
+    async def parse(self, html: str, url: str, limit: Optional[int] = PRODUCT_LIMIT) -> List[ProductData]:
+        """One page from async code, the loop keeps serving other fetches meanwhile"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, extract_products, html, url, self.backend, limit)
+
+    def extract_batches(self, pages: Iterable[Tuple[str, str]], limit: Optional[int] = PRODUCT_LIMIT,
+                        batch_size: int = EXTRACT_BATCH) -> Iterator[List[List[ProductData]]]:
+        """(html, url) pages in, batches of per-page product lists out, in input order"""
+        pages = iter(pages)
+        batches = iter(lambda: list(itertools.islice(pages, batch_size)), [])
+        yield from self.executor.map(extract_batch, batches, itertools.repeat(self.backend), itertools.repeat(limit))
+
+
+# Async fetch engine
+# requests.get opens a fresh TCP (+TLS) connection per call and the thread pool caps us at MAX_WORKERS pages
+# in flight, the sleep(1) then throws most of that away. One event loop can keep hundreds of sockets busy
+# so instead of threads:
+# - HostPool: keep-alive HTTP/1.1 connections per (scheme, host, port), a semaphore caps how many we
+#   open to one host and finished connections go back to an idle list to be reused
+# - TokenBucket: per host rate limit, `rate` requests/second with bursts of up to `burst`
+#   (this is what replaces the fixed sleep - we wait only when we're actually going too fast)
+# - AsyncFetcher: ties them together, speaks just enough HTTP/1.1 (content-length, chunked, gzip, redirects)
+# Plain asyncio streams so there's no extra dependency and it runs against any local HTTP server.
+
+FETCH_CONCURRENCY = 200     # requests in flight across all hosts
+PER_HOST_LIMIT = 8          # open connections per host
+RATE_PER_SECOND = 50.0      # per host, None/0 turns the limiter off
+RATE_BURST = 10
+FETCH_TIMEOUT = 10.0        # seconds for one request/response exchange
+MAX_REDIRECTS = 5
+USER_AGENT = "Mozilla/5.0 (compatible; project2-scraper/1.0)"
+
+
+class FetchError(Exception):
+    pass
+
+
+@dataclass
+class FetchResponse:
+    url: str
+    status: int
+    headers: Dict[str, str]  # lower case names
+    body: bytes
+
+    @property
+    def text(self) -> str:
+        charset = "utf-8"
+        for part in self.headers.get("content-type", "").split(";")[1:]:
+            key, _, value = part.strip().partition("=")
+            if key.lower() == "charset" and value:
+                charset = value.strip('"')
+        try:
+            return self.body.decode(charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise FetchError(f"HTTP {self.status} for {self.url}")
+
+
+class TokenBucket():
+    def __init__(self, rate: Optional[float], burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()  # waiters queue up in order instead of all waking at once
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostPool():
+    def __init__(self, scheme: str, host: str, port: int, limit: int):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.limit = limit
+        self.slots = asyncio.Semaphore(limit)
+        self.idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.scheme == "https":
+            return await asyncio.open_connection(self.host, self.port, ssl=ssl.create_default_context(),
+                                                 server_hostname=self.host)
+        return await asyncio.open_connection(self.host, self.port)
+
+    def take_idle(self) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        while self.idle:
+            reader, writer = self.idle.pop()
+            # the server may have closed it while it sat here
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def put_back(self, conn: Tuple[asyncio.StreamReader, asyncio.StreamWriter], reusable: bool):
+        if reusable and len(self.idle) < self.limit:
+            self.idle.append(conn)
+        else:
+            conn[1].close()
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+async def read_response(reader: asyncio.StreamReader, method: str) -> Tuple[int, Dict[str, str], bytes, bool]:
+    """Read one HTTP/1.x response, returns (status, headers, body, keep_alive)"""
+    try:
+        return await parse_response(reader, method)
+    except asyncio.IncompleteReadError:
+        raise  # the connection died mid-response, fetch_once decides about retrying
+    except (ValueError, EOFError, zlib.error, gzip.BadGzipFile) as e:
+        # a garbled status line, length or chunk size, or a body that doesn't decompress
+        raise FetchError(f"malformed response: {e}") from e
+
+
+async def parse_response(reader: asyncio.StreamReader, method: str) -> Tuple[int, Dict[str, str], bytes, bool]:
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        version, status, *_ = status_line.decode("latin-1").split(None, 2)
+        if not version.startswith("HTTP/"):
+            raise ValueError(f"not an HTTP status line {status_line[:80]!r}")
+        status = int(status)
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if not 100 <= status < 200:
+            break  # skip "100 Continue" and friends
+
+    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if method == "HEAD" or status in (204, 304):
+        body = b""
+    elif "chunked" in headers.get("transfer-encoding", "").lower():
+        parts = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                break
+            parts.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(parts)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()  # body runs until the server closes
+        keep_alive = False
+
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "deflate":
+        body = zlib.decompress(body)
+    return status, headers, body, keep_alive
+
+
+class AsyncFetcher():
+    def __init__(self, concurrency: int = FETCH_CONCURRENCY, per_host: int = PER_HOST_LIMIT,
+                 rate: Optional[float] = RATE_PER_SECOND, burst: int = RATE_BURST, timeout: float = FETCH_TIMEOUT):
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.in_flight = asyncio.Semaphore(concurrency)
+        self.pools: Dict[Tuple[str, str, int], HostPool] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        # counters so we can see the pooling working
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+        self.pools.clear()
+
+    def pool_for(self, scheme: str, host: str, port: int) -> HostPool:
+        key = (scheme, host, port)
+        if key not in self.pools:
+            self.pools[key] = HostPool(scheme, host, port, self.per_host)
+            self.buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        return self.pools[key]
+
+    async def fetch(self, url: str, method: str = "GET", headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self.fetch_once(url, method, headers)
+            location = response.headers.get("location")
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+            try:
+                url = urljoin(url, location)
+            except ValueError as e:  # a garbled Location like "http://[oops"
+                raise FetchError(f"bad redirect from {url} to {location!r}: {e}") from e
+            if response.status == 303:
+                method = "GET"
+        raise FetchError(f"too many redirects for {url}")
+
+    async def fetch_once(self, url: str, method: str, headers: Optional[Dict[str, str]]) -> FetchResponse:
+        try:
+            parts = urlsplit(url)
+            port = parts.port or (443 if parts.scheme.lower() == "https" else 80)  # .port raises on "host:abc"
+        except ValueError as e:
+            raise FetchError(f"bad url {url}: {e}") from e
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise FetchError(f"unsupported url {url}")
+        pool = self.pool_for(scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query  # the #fragment never goes on the wire
+
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request_headers = {"Host": host_header, "User-Agent": USER_AGENT, "Accept": "*/*",
+                           "Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+        request = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items()) + "\r\n"
+        try:
+            request = request.encode("latin-1")
+        except UnicodeEncodeError as e:
+            raise FetchError(f"{url}: can't send non latin-1 characters, quote the url") from e
+
+        async with self.in_flight:
+            await self.buckets[parts.hostname].acquire()
+            async with pool.slots:
+                self.requests += 1
+                # a reused connection can turn out to be dead (server idle timeout), then we retry once on a fresh one
+                for attempt in range(2):
+                    conn = pool.take_idle() if attempt == 0 else None
+                    reused = conn is not None
+                    if conn is None:
+                        conn = await asyncio.wait_for(pool.connect(), self.timeout)
+                        self.connections_opened += 1
+                    else:
+                        self.connections_reused += 1
+                    reader, writer = conn
+                    try:
+                        writer.write(request)
+                        status, response_headers, body, keep_alive = await asyncio.wait_for(
+                            self.exchange(writer, reader, method), self.timeout)
+                    except (ConnectionError, asyncio.IncompleteReadError) as e:
+                        writer.close()
+                        if reused:
+                            continue
+                        raise FetchError(f"{url}: {e}") from e
+                    except FetchError as e:
+                        writer.close()  # never pool a connection we couldn't read a clean response from
+                        raise FetchError(f"{url}: {e}") from e
+                    except BaseException:
+                        writer.close()  # timeout / cancelled - the connection is in an unknown state
+                        raise
+                    pool.put_back(conn, keep_alive)
+                    return FetchResponse(url=url, status=status, headers=response_headers, body=body)
+        raise FetchError(f"{url}: connection failed")
+
+    async def exchange(self, writer: asyncio.StreamWriter, reader: asyncio.StreamReader, method: str):
+        await writer.drain()
+        return await read_response(reader, method)
+
+
+# On-disk page cache
+# One small json file per url (named by the sha256 of the url, #fragment dropped) holding the validators
+# (etag / last-modified), the sha256 of the body, the products and pagination links we parsed out of it - the body itself
+# isn't kept, the hash is enough to tell "unchanged" and the products are what we actually want.
+# Files are written to a temp name and os.replace'd so a crash never leaves half an entry, and the total
+# size is capped by dropping least recently used entries (file mtime = last use, so order survives restarts).
+
+PAGE_CACHE_DIR = os.environ.get("SCRAPER_CACHE_DIR")  # unset = no cache
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class PageCache():
+    def __init__(self, directory: str, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes on disk, oldest use first
+        self.total_bytes = 0
+        # counters: pages we didn't have to parse
+        self.not_modified = 0
+        self.unchanged = 0
+        # run_scraper shares one cache between its threads: the lock guards the index and counters,
+        # file writes go through a temp file of their own before the rename
+        self.lock = threading.Lock()
+
+        existing = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(directory, name))
+                existing.append((st.st_mtime, name[:-5], st.st_size))
+        for _, key, size in sorted(existing):
+            self.sizes[key] = size
+            self.total_bytes += size
+
+    def key(self, url: str) -> str:
+        return hashlib.sha256(urldefrag(url)[0].encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        key = self.key(url)
+        with self.lock:
+            if key not in self.sizes:
+                return None
+        try:
+            with open(self.path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.forget(key)
+            return None
+        with self.lock:
+            if key in self.sizes:
+                self.sizes.move_to_end(key)
+        return entry
+
+    def count_hit(self, not_modified: bool):
+        with self.lock:
+            if not_modified:
+                self.not_modified += 1
+            else:
+                self.unchanged += 1
+
+    def put(self, url: str, headers: Dict[str, str], body: bytes, products: List[ProductData],
+            links: Optional[List[str]] = None):
+        entry = {
+            "url": urldefrag(url)[0],
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "sha256": hashlib.sha256(body).hexdigest(),
+            "products": [asdict(p) for p in products],
+            "links": links or [],
+        }
+        self.write(self.key(url), entry)
+
+    def refresh(self, url: str, entry: Dict[str, Any], headers: Dict[str, str]):
+        """Page didn't change - pick up any new validators, otherwise just mark it recently used"""
+        key = self.key(url)
+        etag = headers.get("etag") or entry.get("etag")
+        last_modified = headers.get("last-modified") or entry.get("last_modified")
+        if etag != entry.get("etag") or last_modified != entry.get("last_modified"):
+            self.write(key, dict(entry, etag=etag, last_modified=last_modified))
+        elif key in self.sizes:  # a racing eviction just makes utime fail, handled below
+            try:
+                os.utime(self.path(key))
+            except OSError:
+                self.forget(key)
+
+    def write(self, key: str, entry: Dict[str, Any]):
+        data = json.dumps(entry).encode()
+        # unique temp name: two threads storing the same url must not share (and rename away) one file
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(data)
+        os.replace(f.name, self.path(key))
+        with self.lock:
+            self.total_bytes += len(data) - self.sizes.pop(key, 0)
+            self.sizes[key] = len(data)
+            while self.total_bytes > self.max_bytes and len(self.sizes) > 1:
+                oldest, size = self.sizes.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(self.path(oldest))
+                except OSError:
+                    pass
+
+    def forget(self, key: str):
+        with self.lock:
+            self.total_bytes -= self.sizes.pop(key, 0)
+
+
 # DataAnalyzer Class (The CPU Hog)
 # Purpose: Handles the CPU-bound task of processing raw scraped data.
 #  Methods:
@@ -236,6 +983,393 @@ class DataAnalyzer():
         return stats
        
        
+# StreamingAnalyzer
+# calculate_statistics needs every product in memory before it can start. For the pipeline we want the
+# same numbers from a stream of batches in constant memory: Welford's running mean / variance (population SD,
+# like numpy.std) and a fixed size reservoir sample for the median (exact until the reservoir fills up).
+
+RESERVOIR_SIZE = 10_000
+
+
+class StreamingAnalyzer():
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.reservoir_size = reservoir_size
+        self.rng = random.Random(seed)
+        self.products = 0    # everything we saw
+        self.count = 0       # the ones with a price (calculate_statistics filters out 0.0 too)
+        self.mean = 0.0
+        self.m2 = 0.0        # sum of squared differences from the mean
+        self.reservoir: List[float] = []
+
+    def add(self, products: List[ProductData]):
+        for product in products:
+            self.products += 1
+            price = product.price
+            if price <= 0:
+                continue
+            self.count += 1
+            delta = price - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (price - self.mean)
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir.append(price)
+            else:
+                j = self.rng.randrange(self.count)
+                if j < self.reservoir_size:
+                    self.reservoir[j] = price
+
+    def calculate_statistics(self):
+        if not self.count:
+            return {"Mean": 0, "Median": 0, "SD": 0}
+        return {
+            "Mean": self.mean,
+            "Median": float(numpy.median(self.reservoir)),
+            "SD": math.sqrt(self.m2 / self.count),
+        }
+
+
+# CrawlFrontier
+# The url list used to be hardcoded. The frontier starts from seed urls and grows from what we fetch
+# (the catalog's pagination links, and the product pages if follow_products), shallowest depth first.
+# - dedup: a Bloom filter of every url ever scheduled, ~1.8 MB for a million urls at 0.1% false positives
+#   (a false positive means we skip a url we never saw - fine for a crawl, a set of a million urls is ~100 MB)
+# - urls are normalised first (no #fragment, lower case scheme/host) and only the seeds' hosts are followed
+# - state_dir makes it resumable: every change goes to an append-only journal ("+depth url" scheduled,
+#   "-url" done) flushed per page, and every CHECKPOINT_SECONDS the whole state (pending urls + the filter
+#   bits) is written to one file with os.replace and the journal starts over. Loading = checkpoint + journal,
+#   so after a crash only the pages that were in flight get fetched again.
+
+FRONTIER_MAX_DEPTH = 50
+FRONTIER_EXPECTED_URLS = 1_000_000
+FRONTIER_FALSE_POSITIVE_RATE = 0.001
+CHECKPOINT_SECONDS = 30.0
+CRAWL_STATE_DIR = os.environ.get("CRAWL_STATE_DIR")  # unset = in-memory frontier, nothing to resume
+FRONTIER_HEADER = struct.Struct("<I")  # length of the json part of the checkpoint file
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(urldefrag(url.strip())[0])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+class BloomFilter():
+    def __init__(self, expected_items: int, false_positive_rate: float):
+        # the textbook sizes: m = -n ln p / (ln 2)^2 bits, k = m/n ln 2 hashes
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item: str) -> Iterator[int]:
+        # double hashing: k positions out of one 128 bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """Adds the item, True if it (probably) wasn't there before"""
+        new = False
+        for pos in self.positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] >> bit & 1:
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos // 8] >> (pos % 8) & 1 for pos in self.positions(item))
+
+
+class CrawlFrontier():
+    def __init__(self, state_dir: Optional[str] = CRAWL_STATE_DIR, max_depth: int = FRONTIER_MAX_DEPTH,
+                 max_pages: Optional[int] = None, follow_products: bool = True,
+                 expected_urls: int = FRONTIER_EXPECTED_URLS, false_positive_rate: float = FRONTIER_FALSE_POSITIVE_RATE):
+        self.state_dir = state_dir
+        self.max_depth = max_depth
+        self.max_pages = max_pages  # pages handed out by this run, None = until the frontier is empty
+        self.follow_products = follow_products
+        self.seen = BloomFilter(expected_urls, false_positive_rate)
+        self.heap: List[Tuple[int, int, str]] = []  # (depth, seq, url), seq keeps equal depths first in first out
+        self.seq = 0
+        self.in_flight: Dict[str, int] = {}  # url -> depth, handed out but not done yet
+        self.hosts = set()  # only links on the seeds' hosts are followed
+        self.scheduled = 0
+        self.pages_done = 0
+        self.handed_out = 0
+        self.changed: Optional[asyncio.Event] = None  # made inside the running loop (python 3.9 binds it at creation)
+        self.journal = None
+        self.last_checkpoint = time.monotonic()
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self.load()
+            # rewrite right away rather than appending, a torn last line from a crash would glue onto the next record
+            self.checkpoint()
+
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.state_dir, "frontier.state")
+
+    def journal_path(self) -> str:
+        return os.path.join(self.state_dir, "frontier.journal")
+
+    # --- scheduling ---
+
+    def seed(self, url: str):
+        self.hosts.add(urlsplit(normalize_url(url)).netloc)
+        self.add(url, 0)
+
+    def add(self, url: str, depth: int) -> bool:
+        url = normalize_url(url)
+        if depth > self.max_depth or urlsplit(url).netloc not in self.hosts:
+            return False
+        if not self.seen.add(url):
+            return False  # scheduled before (or a false positive)
+        self.push(url, depth)
+        self.log(f"+{depth} {url}")
+        return True
+
+    def add_links(self, parent: str, links: Iterable[str]):
+        depth = self.in_flight.get(normalize_url(parent), 0) + 1
+        for link in links:
+            self.add(link, depth)
+
+    def push(self, url: str, depth: int):
+        heapq.heappush(self.heap, (depth, self.seq, url))
+        self.seq += 1
+        self.scheduled += 1
+        self.wake()
+
+    def wake(self):
+        if self.changed is not None:
+            self.changed.set()
+
+    async def next_url(self) -> Optional[str]:
+        """Shallowest pending url, waits while the queue is empty but pages in flight may add more, None = done"""
+        while True:
+            if self.max_pages is not None and self.handed_out >= self.max_pages:
+                return None
+            if self.heap:
+                depth, _, url = heapq.heappop(self.heap)
+                self.in_flight[url] = depth
+                self.handed_out += 1
+                return url
+            if not self.in_flight:
+                return None
+            if self.changed is None:
+                self.changed = asyncio.Event()
+            self.changed.clear()
+            await self.changed.wait()
+
+    def done(self, url: str):
+        """The page is fetched and its links added (or it failed), never hand it out again"""
+        url = normalize_url(url)
+        if self.in_flight.pop(url, None) is None:
+            return
+        self.pages_done += 1
+        self.log(f"-{url}")
+        if self.journal is not None:
+            self.journal.flush()
+            if time.monotonic() - self.last_checkpoint > CHECKPOINT_SECONDS:
+                self.checkpoint()
+        self.wake()
+
+    def pending(self) -> int:
+        return len(self.heap) + len(self.in_flight)
+
+    # --- persistence ---
+
+    def log(self, line: str):
+        if self.journal is not None:
+            self.journal.write(line + "\n")
+
+    def checkpoint(self):
+        """Whole state to disk in one file, then a fresh journal"""
+        if not self.state_dir:
+            return
+        # in flight urls aren't done, a crash before they finish means fetching them again
+        pending = [[depth, url] for depth, _, url in sorted(self.heap)]
+        pending += [[depth, url] for url, depth in self.in_flight.items()]
+        header = json.dumps({
+            "pending": pending,
+            "hosts": sorted(self.hosts),
+            "pages_done": self.pages_done,
+            "scheduled": self.scheduled,
+            "bloom_size": self.seen.size,
+            "bloom_hashes": self.seen.hashes,
+        }).encode()
+        tmp = self.checkpoint_path() + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(FRONTIER_HEADER.pack(len(header)))
+            f.write(header)
+            f.write(self.seen.bits)
+        os.replace(tmp, self.checkpoint_path())
+        # a crash between the replace and here just replays a journal that's already in the checkpoint
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_path(), "w")
+        self.last_checkpoint = time.monotonic()
+
+    def load(self):
+        pending: Dict[str, int] = {}
+        if os.path.exists(self.checkpoint_path()):
+            with open(self.checkpoint_path(), "rb") as f:
+                (length,) = FRONTIER_HEADER.unpack(f.read(FRONTIER_HEADER.size))
+                state = json.loads(f.read(length))
+                bits = f.read()
+            self.seen.size, self.seen.hashes = state["bloom_size"], state["bloom_hashes"]
+            self.seen.bits = bytearray(bits)
+            self.hosts.update(state["hosts"])
+            self.pages_done = state["pages_done"]
+            self.scheduled = state["scheduled"]
+            for depth, url in state["pending"]:
+                pending.setdefault(url, depth)
+        if os.path.exists(self.journal_path()):
+            with open(self.journal_path()) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn last write from a crash
+                    if line.startswith("+"):
+                        depth, _, url = line[1:-1].partition(" ")
+                        self.seen.add(url)
+                        self.hosts.add(urlsplit(url).netloc)
+                        if url not in pending:
+                            pending[url] = int(depth)
+                            self.scheduled += 1
+                    elif line.startswith("-") and pending.pop(line[1:-1], None) is not None:
+                        self.pages_done += 1
+        for url, depth in sorted(pending.items(), key=lambda item: item[1]):
+            heapq.heappush(self.heap, (depth, self.seq, url))
+            self.seq += 1
+
+    def close(self):
+        if self.journal is not None:
+            self.checkpoint()
+            self.journal.close()
+            self.journal = None
+
+
+# CrawlPipeline
+# run_scraper collects every product before run_analyzer starts, so nothing is analysed until the last page
+# is in and memory grows with the crawl. Here the three stages run at the same time, joined by bounded queues:
+#   urls -> [fetch x fetchers] -> pages queue -> [parse x parsers] -> batches queue -> [analyze] -> stats
+# - analysis starts on the first parsed page
+# - a full queue makes the stage before it wait on put(), so a slow analyzer slows parsing which slows
+#   fetching (backpressure) instead of pages piling up
+# - at most fetchers + queue_size + parsers pages and queue_size + 1 product batches exist at once,
+#   the urls are pulled lazily from any iterable and no product list is kept after analysis
+# Analysis runs in a thread so a slow analyzer doesn't freeze the event loop the fetchers live on.
+# With a CrawlFrontier the urls come from it instead, and each parsed page feeds its links back in.
+
+PIPELINE_FETCHERS = 64
+PIPELINE_PARSERS = EXTRACT_WORKERS
+PIPELINE_QUEUE_SIZE = 32
+
+
+class CrawlPipeline():
+    def __init__(self, scraper: ProductScrapper, analyzer: StreamingAnalyzer, fetchers: int = PIPELINE_FETCHERS,
+                 parsers: int = PIPELINE_PARSERS, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 frontier: Optional[CrawlFrontier] = None):
+        self.scraper = scraper
+        self.frontier = frontier
+        self.analyzer = analyzer
+        self.fetchers = fetchers
+        self.parsers = parsers
+        self.queue_size = queue_size
+        # counters
+        self.pages_fetched = 0
+        self.pages_failed = 0
+        self.pages_analyzed = 0
+        self.max_pages_in_flight = 0   # fetched but not analysed yet, the memory bound in practice
+        self.first_analysis_after: Optional[float] = None
+
+    async def run(self, urls: Iterable[str], fetcher: AsyncFetcher) -> Dict[str, Any]:
+        self.start = time.perf_counter()
+        pages: asyncio.Queue = asyncio.Queue(self.queue_size)
+        batches: asyncio.Queue = asyncio.Queue(self.queue_size)
+        if self.frontier is not None:
+            for url in urls:
+                self.frontier.seed(url)  # already seen when resuming, then it's a no-op
+            next_url = self.frontier.next_url
+        else:
+            url_iter = iter(urls)  # shared by the fetch tasks, each url goes to exactly one of them
+
+            async def next_url():
+                return next(url_iter, None)
+
+        fetch_tasks = [asyncio.create_task(self.fetch_stage(next_url, fetcher, pages)) for _ in range(self.fetchers)]
+        parse_tasks = [asyncio.create_task(self.parse_stage(pages, batches)) for _ in range(self.parsers)]
+        analyze_task = asyncio.create_task(self.analyze_stage(batches))
+        try:
+            # shut down front to back: a None per consumer once its producers are done
+            await asyncio.gather(*fetch_tasks)
+            for _ in parse_tasks:
+                await pages.put(None)
+            await asyncio.gather(*parse_tasks)
+            await batches.put(None)
+            await analyze_task
+        finally:
+            for task in fetch_tasks + parse_tasks + [analyze_task]:
+                task.cancel()
+
+        return {
+            "pages": self.pages_analyzed,
+            "failed": self.pages_failed,
+            "products": self.analyzer.products,
+            "seconds": time.perf_counter() - self.start,
+            "first_analysis_after": self.first_analysis_after,
+            "max_pages_in_flight": self.max_pages_in_flight,
+            "stats": self.analyzer.calculate_statistics(),
+        }
+
+    async def fetch_stage(self, next_url, fetcher: AsyncFetcher, pages: asyncio.Queue):
+        while True:
+            url = await next_url()
+            if url is None:
+                return
+            fetched = await self.scraper.fetch_page(fetcher, url)
+            if fetched is None:
+                self.pages_failed += 1
+                if self.frontier is not None:
+                    self.frontier.done(url)
+                continue
+            self.pages_fetched += 1
+            self.max_pages_in_flight = max(self.max_pages_in_flight, self.pages_fetched - self.pages_analyzed)
+            await pages.put((url, *fetched))  # waits here while the parsers are behind
+
+    async def parse_stage(self, pages: asyncio.Queue, batches: asyncio.Queue):
+        while True:
+            item = await pages.get()
+            if item is None:
+                return
+            url, response, cached = item
+            try:
+                products = cached if cached is not None else await self.scraper.parse_page(url, response)
+                if self.frontier is not None:
+                    self.frontier.add_links(url, self.scraper.pagination_links(url, response))
+                    if self.frontier.follow_products:
+                        self.frontier.add_links(url, (product.url for product in products))
+            except Exception as e:
+                # a page that breaks the parser must not take this task down with it, the fetchers
+                # would then wait forever on a full queue (or on the frontier for this url)
+                print(f"Error parsing {url}: {e}")
+                self.pages_failed += 1
+                continue
+            finally:
+                if self.frontier is not None:
+                    self.frontier.done(url)
+            await batches.put(products)  # waits here while the analyzer is behind
+
+    async def analyze_stage(self, batches: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            products = await batches.get()
+            if products is None:
+                return
+            await loop.run_in_executor(None, self.analyzer.add, products)
+            self.pages_analyzed += 1
+            if self.first_analysis_after is None:
+                self.first_analysis_after = time.perf_counter() - self.start
+
+
 # ConcurrentManager Class (The Orchestrator)
 # Purpose: Manages the flow, decides on the concurrency model, and collects results.
 # Methods:run_scraper(self, urls): Uses concurrent.futures.ThreadPoolExecutor to execute the ProductScraper.fetch_data method for all URLs concurrently.
@@ -245,13 +1379,17 @@ class DataAnalyzer():
 MAX_WORKERS = 5
 
 class ConcurrentManager():
-    def __init__(self, urls: List[str]):
+    def __init__(self, urls: List[str], cache: Optional[PageCache] = None, extractor: Optional[ExtractionPool] = None):
         self.urls = urls
+        self.extractor = extractor
+        if cache is None and PAGE_CACHE_DIR:
+            cache = PageCache(PAGE_CACHE_DIR)
+        self.cache = cache
         
     # Corrected with actual ThreadPoolExecutor
     def run_scraper(self):
         start_time = time.perf_counter()
-        scraper = ProductScrapper([]) # Initialize Scrapper to get the method
+        scraper = ProductScrapper([], cache=self.cache) # Initialize Scrapper to get the method
         all_results = []
         
         # Use the Executor via a 'with' statement for proper resource management
@@ -269,8 +1407,76 @@ class ConcurrentManager():
         end_time = time.perf_counter()
         duration = end_time - start_time
         print(f"[TEST 1: I/O (Threads)] Scraped {len(all_results)} products in {duration:.4f}s")
+        self.report_cache()
+        return all_results
+
+    # Same job on one event loop + the keep-alive pool, no thread cap
+    def run_scraper_async(self, fetcher_options: Optional[Dict] = None):
+        start_time = time.perf_counter()
+        all_results = asyncio.run(self.scrape_async(fetcher_options or {}))
+        duration = time.perf_counter() - start_time
+        print(f"[TEST 1b: I/O (asyncio)] Scraped {len(all_results)} products in {duration:.4f}s")
+        self.report_cache()
+        return all_results
+
+    async def scrape_async(self, fetcher_options: Dict) -> List[ProductData]:
+        scraper = ProductScrapper([], cache=self.cache, extractor=self.extractor)
+        all_results = []
+        async with AsyncFetcher(**fetcher_options) as fetcher:
+            # gather keeps the results in url order, like executor.map
+            for products_list in await asyncio.gather(*(scraper.fetch_data_async(fetcher, url) for url in self.urls)):
+                if products_list:
+                    all_results.extend(products_list)
+            print(f"[asyncio] {fetcher.requests} requests over {fetcher.connections_opened} connections "
+                  f"({fetcher.connections_reused} reused)")
         return all_results
             
+    # Fetch, parse and analyse at the same time (CrawlPipeline) - results stream into a StreamingAnalyzer
+    def run_pipeline(self, fetcher_options: Optional[Dict] = None, **pipeline_options):
+        scraper = ProductScrapper([], cache=self.cache, extractor=self.extractor, verbose=False)
+        pipeline = CrawlPipeline(scraper, StreamingAnalyzer(), **pipeline_options)
+
+        async def crawl():
+            async with AsyncFetcher(**(fetcher_options or {})) as fetcher:
+                return await pipeline.run(self.urls, fetcher)
+
+        result = asyncio.run(crawl())
+        first = result["first_analysis_after"]
+        print(f"[TEST 1c: Pipeline] Analysed {result['pages']} pages / {result['products']} products in "
+              f"{result['seconds']:.4f}s, first page analysed after {first if first is not None else 0:.4f}s, "
+              f"at most {result['max_pages_in_flight']} pages in flight")
+        print(f"[Pipeline] {result['stats']}")
+        self.report_cache()
+        return result
+
+    # Crawl from self.urls as seeds, following pagination (and product pages) through a CrawlFrontier.
+    # With a state_dir, running it again after a crash / ctrl-c / max_pages picks up where it stopped.
+    def run_crawl(self, state_dir: Optional[str] = CRAWL_STATE_DIR, max_pages: Optional[int] = None,
+                  max_depth: int = FRONTIER_MAX_DEPTH, follow_products: bool = True,
+                  fetcher_options: Optional[Dict] = None, **pipeline_options):
+        frontier = CrawlFrontier(state_dir, max_depth=max_depth, max_pages=max_pages, follow_products=follow_products)
+        scraper = ProductScrapper([], cache=self.cache, extractor=self.extractor, verbose=False, product_limit=None)
+        pipeline = CrawlPipeline(scraper, StreamingAnalyzer(), frontier=frontier, **pipeline_options)
+
+        async def crawl():
+            async with AsyncFetcher(**(fetcher_options or {})) as fetcher:
+                return await pipeline.run(self.urls, fetcher)
+
+        try:
+            result = asyncio.run(crawl())
+        finally:
+            frontier.close()
+        print(f"[TEST 1d: Crawl] {result['pages']} pages / {result['products']} products in {result['seconds']:.4f}s, "
+              f"{frontier.pages_done} pages done overall, {frontier.pending()} still pending")
+        print(f"[Crawl] {result['stats']}")
+        self.report_cache()
+        return result
+
+    def report_cache(self):
+        if self.cache is not None:
+            print(f"[Cache] skipped parsing {self.cache.not_modified} pages on 304, {self.cache.unchanged} on an "
+                  f"unchanged body ({len(self.cache.sizes)} entries, {self.cache.total_bytes / 1024:.0f} KB)")
+
     # Corrected with actual ProcessPoolExecutor            
     # Inside ConcurrentManager class
     def run_analyzer(self, data: List[ProductData], executor_type='Process'):
@@ -328,6 +1534,18 @@ if __name__ == "__main__":
     print(f"\nTOTAL PRODUCTS COLLECTED: {len(all_products)}")
     print("-" * 60)
 
+    print("\n--- RUNNING TEST 1b: I/O (Scraper) with ASYNCIO + keep-alive pool ---")
+    manager.run_scraper_async()
+    print("-" * 60)
+
+    print("\n--- RUNNING TEST 1c: fetch -> parse -> analyze PIPELINE (bounded queues) ---")
+    manager.run_pipeline()
+    print("-" * 60)
+
+    print("\n--- RUNNING TEST 1d: CRAWL following pagination (dedup + resumable frontier) ---")
+    manager.run_crawl(max_pages=20)
+    print("-" * 60)
+
     # =========================================================================
     # TEST 2: CPU BOUND TASK with PROCESSES (Expected: FAST - GIL is bypassed)
     # =========================================================================
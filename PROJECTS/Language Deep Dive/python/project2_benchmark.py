@@ -0,0 +1,389 @@
+# Benchmarks for the scraper (project2.py)
+# Works on saved catalog pages (fixture .html files), nothing touches the network except `save`.
+#
+# Fixtures: write synthetic Jumia-like catalog pages to a directory (big head / nav / scripts around
+# ~40 product cards, a few cards missing a link or a price, same shape as the real listing)
+#   python3 project2_benchmark.py fixtures --out fixtures/ --pages 200
+#
+# Save: download real catalog pages as fixtures, through the async fetcher
+#   python3 project2_benchmark.py save --out fixtures/ "https://www.jumia.com.ng/televisions/?page=2"
+#
+# Parse: pages/s of every installed parser backend in one process, each checked against the original
+# bs4 output, then the pooled extraction stage (ExtractionPool) with N worker processes.
+# Without --pages it generates the synthetic pages in memory.
+#   python3 project2_benchmark.py parse --pages fixtures/ --workers 4
+#   python3 project2_benchmark.py parse --synthetic 300 --all-products
+#
+# Fetch: the async fetcher against a local ThreadingHTTPServer (keep-alive HTTP/1.1, pages served plain /
+# chunked / gzip / gzip+chunked). Checks every body, that the connections got reused (and how many the
+# server actually saw), ETag -> 304, redirects, and that the broken responses come back as FetchError.
+#   python3 project2_benchmark.py fetch --pages 300 --per-host 8
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import project2
+from project2 import AsyncFetcher, ExtractionPool, FetchError, extract_products
+
+FIXTURE_BASE_URL = "https://www.jumia.com.ng/televisions/"
+BRANDS = ["Samsung", "LG", "Hisense", "TCL", "Sony", "Nexus", "Polystar", "Skyrun", "Royal", "Syinix"]
+
+
+def product_card(rng, page_no, i):
+    sku = f"SA{page_no:04d}{i:03d}NAFAMZ"
+    brand = rng.choice(BRANDS)
+    inches = rng.choice((24, 32, 43, 50, 55, 65, 75))
+    name = f"{brand} {inches}&quot; Smart HD LED TV &amp; Wall Bracket - Black"
+    slug = f"{brand.lower()}-{inches}-smart-tv-{sku.lower()}"
+    price = rng.randrange(45_000, 1_500_000)
+    old = int(price * rng.uniform(1.05, 1.6))
+    if i % 11 == 5:
+        price_html = f"₦ {price:,} - ₦ {old:,}"  # price ranges don't parse, 0.0 like the original
+    else:
+        price_html = f"₦ {price:,}"
+    if i % 17 == 3:
+        link = f'<a href="/{slug}.html" data-id="{sku}">'  # no a.core, falls back to the page url
+    else:
+        link = (f'<a class="core" href="/{slug}.html" data-gtm-id="{sku}" data-ga4-item_name="{name}" '
+                f'data-ga4-price="{price}" data-ga4-item_brand="{brand}" data-ga4-item_category="Televisions">')
+    price_div = "" if i % 13 == 7 else f'<div class="prc">{price_html}</div>'
+    article_class = "prd _box _hvr _spnsrd" if i % 19 == 9 else "prd _box _hvr"  # sponsored cards don't match
+    return (
+        f'<article class="{article_class}">{link}<div class="img-c"><img data-src="https://ng.jumia.is/unsafe/'
+        f'fit-in/300x300/filters:fill(white)/product/{sku}.jpg" src="data:image/svg+xml;charset=utf-8,%3Csvg'
+        f'%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%3E%3C%2Fsvg%3E" class="img" width="208" '
+        f'height="208" alt="{name}" loading="lazy"></div><div class="info"><h3 class="name">{name}</h3>'
+        f'{price_div}<div class="s-prc-w"><div class="old">₦ {old:,}</div><div class="bdg _dsct _sm">'
+        f'{100 - price * 100 // old}%</div></div><div class="rev"><div class="stars _s">{rng.uniform(3, 5):.1f} '
+        f'out of 5<div class="in" style="width:{rng.randrange(60, 100)}%"></div></div>({rng.randrange(1, 900)})'
+        f'</div></div></a><footer class="ft"><form method="POST" action="/cart/"><input type="hidden" name="sku" '
+        f'value="{sku}"><button class="add btn _prim -pea _md">Add To Cart</button></form></footer></article>'
+    )
+
+
+def catalog_page(page_no, products=40):
+    """One synthetic catalog page, ~200 KB like the real one (most of it isn't product cards)."""
+    rng = random.Random(page_no)
+    config = json.dumps({f"key{i}": "x" * rng.randrange(20, 200) for i in range(200)})
+    nav = "".join(f'<li><a href="/category-{i}/" class="itm">Category {i}</a></li>' for i in range(400))
+    cards = "".join(product_card(rng, page_no, i) for i in range(products))
+    pages = "".join(f'<a class="pg" href="/televisions/?page={n}#catalog-listing">{n}</a>' for n in range(1, 51))
+    footer = "".join(f'<a href="/sp-help-{i}/" class="_more">Help topic {i}</a>' for i in range(150))
+    return (
+        '<!DOCTYPE html><html lang="en" dir="ltr"><head><meta charset="utf-8">'
+        '<title>Televisions | Buy Smart TVs Online | Jumia Nigeria</title>'
+        f'<script>window.__CONFIG__ = {config};</script><style>{".c{margin:0;padding:0}" * 400}</style></head>'
+        f'<body><header class="-bg-wt"><nav><ul>{nav}</ul></nav></header><main class="-pvs">'
+        f'<section class="card -fh"><div class="-paxs row _no-g _4cl-3cm-shs">{cards}</div>'
+        f'<div class="pg-w -ptm -pbxl">{pages}</div></section></main><footer>{footer}</footer>'
+        '<script>console.log("<article> in a script string is not a product");</script></body></html>'
+    )
+
+
+def load_pages(directory):
+    """(html, url) for each .html in the directory, urls from index.json when `save` wrote one"""
+    index = {}
+    index_path = os.path.join(directory, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                pages.append((f.read(), index.get(name, FIXTURE_BASE_URL)))
+    return pages
+
+
+def run_fixtures(args):
+    os.makedirs(args.out, exist_ok=True)
+    total = 0
+    for n in range(args.pages):
+        html = catalog_page(n + 1, args.products)
+        with open(os.path.join(args.out, f"page-{n + 1:04d}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+        total += len(html.encode())
+    print(f"wrote {args.pages} pages, {total / 1e6:.1f} MB to {args.out}")
+
+
+def run_save(args):
+    os.makedirs(args.out, exist_ok=True)
+
+    async def main():
+        async with AsyncFetcher() as fetcher:
+            return await asyncio.gather(*(fetcher.fetch(url) for url in args.urls), return_exceptions=True)
+
+    index_path = os.path.join(args.out, "index.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    for url, response in zip(args.urls, asyncio.run(main())):
+        if isinstance(response, Exception) or response.status != 200:
+            print(f"skipped {url}: {response if isinstance(response, Exception) else response.status}")
+            continue
+        name = f"saved-{len(index) + 1:04d}.html"
+        with open(os.path.join(args.out, name), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        index[name] = response.url
+        print(f"saved {url} -> {name} ({len(response.body) / 1024:.0f} KB)")
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=1)
+
+
+def time_backend(backend, pages, limit, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extract_products(html, url, backend, limit) for html, url in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def run_parse_benchmark(args):
+    if args.pages:
+        pages = load_pages(args.pages)
+    else:
+        pages = [(catalog_page(n + 1), FIXTURE_BASE_URL) for n in range(args.synthetic)]
+    if not pages:
+        sys.exit(f"no .html pages in {args.pages}")
+    limit = None if args.all_products else args.limit
+    megabytes = sum(len(html.encode()) for html, _ in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB, limit {limit or 'all'} products/page, "
+          f"installed backends: {', '.join(sorted(project2.PARSER_BACKENDS))} (default {project2.PARSER_BACKEND})")
+
+    seconds, reference = time_backend("bs4", pages, limit, args.repeat)
+    products = sum(len(p) for p in reference)
+    print(f"{'bs4':>10}: {len(pages) / seconds:8.1f} pages/s {megabytes / seconds:7.1f} MB/s   "
+          f"({products} products)")
+    mismatches = 0
+    for backend in ("stream", "lxml", "selectolax"):
+        if backend not in project2.PARSER_BACKENDS:
+            continue
+        backend_seconds, results = time_backend(backend, pages, limit, args.repeat)
+        same = results == reference
+        mismatches += not same
+        print(f"{backend:>10}: {len(pages) / backend_seconds:8.1f} pages/s {megabytes / backend_seconds:7.1f} MB/s   "
+              f"x{seconds / backend_seconds:.1f} vs bs4, {'same products' if same else 'DIFFERENT products'}")
+
+    backend = args.backend or project2.PARSER_BACKEND
+    with ExtractionPool(workers=args.workers, backend=backend) as pool:
+        list(pool.extract_batches(pages[:args.workers], limit))  # start the workers outside the timing
+        start = time.perf_counter()
+        results = [products for batch in pool.extract_batches(pages, limit, args.batch) for products in batch]
+        pooled = time.perf_counter() - start
+    same = results == reference
+    mismatches += not same
+    print(f"{'pool':>10}: {len(pages) / pooled:8.1f} pages/s {megabytes / pooled:7.1f} MB/s   "
+          f"{backend} x {args.workers} workers, {'same products' if same else 'DIFFERENT products'}")
+    if mismatches:
+        sys.exit(1)
+
+
+# Local server for the fetch benchmark. /page/N is served 4 ways by N % 4 so every body path of
+# read_response gets exercised on the same keep-alive connections; the rest are the error cases.
+PAGE_MODES = ("plain", "chunked", "gzip", "gzip+chunked")
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, otherwise every request is a new connection
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/page/"):
+            self.send_page(int(path[len("/page/"):]))
+        elif path.startswith("/redirect/"):
+            self.send_response(302)
+            self.send_header("Location", "/page/" + path[len("/redirect/"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif path == "/bad-redirect":
+            self.send_response(302)
+            self.send_header("Location", "http://[oops/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif path == "/garbled":
+            self.wfile.write(b"HTTX/1.1 ok-ish\r\n\r\n")
+            self.close_connection = True
+        elif path == "/bad-gzip":
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", "11")
+            self.end_headers()
+            self.wfile.write(b"not gzipped")
+        elif path == "/bad-chunk":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"zz\r\nhello\r\n0\r\n\r\n")
+            self.close_connection = True
+        elif path == "/drop":
+            self.close_connection = True  # hang up without answering
+        else:
+            self.send_error(404)
+
+    def send_page(self, n):
+        body, zipped = self.server.pages[n]
+        etag = f'"page-{n}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        mode = PAGE_MODES[n % len(PAGE_MODES)]
+        if mode.startswith("gzip"):
+            body = zipped
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        if mode.startswith("gzip"):
+            self.send_header("Content-Encoding", "gzip")
+        if mode.endswith("chunked"):
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(body), 16384):
+                chunk = body[i:i + 16384]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+def start_server(pages):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+    server.pages = {n: (body, gzip.compress(body, compresslevel=1)) for n, body in pages.items()}
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_fetch_benchmark(args):
+    pages = {n: catalog_page(n).encode() for n in range(1, args.pages + 1)}
+    server = start_server(pages)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    megabytes = sum(len(body) for body in pages.values()) / 1e6
+    print(f"{args.pages} pages, {megabytes:.1f} MB from {base} ({' / '.join(PAGE_MODES)}), "
+          f"{args.per_host} connections per host")
+    failures = []
+
+    def check(ok, what):
+        print(f"  {'ok  ' if ok else 'FAIL'} {what}")
+        if not ok:
+            failures.append(what)
+
+    async def expect_fetch_error(fetcher, url):
+        try:
+            response = await fetcher.fetch(url)
+        except FetchError as e:
+            return str(e)
+        return f"no FetchError, got HTTP {response.status}"
+
+    async def main():
+        async with AsyncFetcher(per_host=args.per_host, rate=None) as fetcher:
+            best = float("inf")
+            for round_no in range(args.repeat):
+                start = time.perf_counter()
+                responses = await asyncio.gather(*(fetcher.fetch(f"{base}/page/{n}") for n in pages))
+                best = min(best, time.perf_counter() - start)
+                check(all(r.status == 200 and r.body == pages[n] for n, r in zip(pages, responses)),
+                      f"round {round_no + 1}: {len(responses)} bodies match")
+            print(f"  fetched {len(pages) / best:.0f} pages/s, {megabytes / best:.1f} MB/s (best round)")
+            print(f"  {fetcher.requests} requests over {fetcher.connections_opened} connections "
+                  f"({fetcher.connections_reused} reused), server saw {server.connections}")
+            check(fetcher.connections_opened <= args.per_host, f"at most {args.per_host} connections opened")
+            check(fetcher.connections_opened + fetcher.connections_reused == fetcher.requests,
+                  "every request on a new or a reused connection")
+            check(server.connections == fetcher.connections_opened, "server saw the same number of connections")
+
+            page = await fetcher.fetch(f"{base}/page/3")
+            etag = page.headers.get("etag")
+            cached = await fetcher.fetch(f"{base}/page/3", headers={"If-None-Match": etag})
+            check(cached.status == 304 and cached.body == b"", f"If-None-Match {etag} -> 304, empty body")
+            stale = await fetcher.fetch(f"{base}/page/3", headers={"If-None-Match": '"old"'})
+            check(stale.status == 200 and stale.body == pages[3], "stale etag -> 200, full body")
+
+            moved = await fetcher.fetch(f"{base}/redirect/5")
+            check(moved.url == f"{base}/page/5" and moved.body == pages[5], "302 followed to /page/5")
+            missing = await fetcher.fetch(f"{base}/nope")
+            try:
+                missing.raise_for_status()
+                raised = False
+            except FetchError:
+                raised = True
+            check(missing.status == 404 and raised, "404 -> raise_for_status raises FetchError")
+
+            for path in ("/garbled", "/bad-gzip", "/bad-chunk", "/drop", "/bad-redirect"):
+                error = await expect_fetch_error(fetcher, base + path)
+                check(not error.startswith("no FetchError"), f"{path:<14} -> FetchError ({error[:60]})")
+            error = await expect_fetch_error(fetcher, "http://127.0.0.1:abc/page/1")
+            check(not error.startswith("no FetchError"), f"bad port      -> FetchError ({error[:60]})")
+
+            # the pool must still hand out working connections after all that
+            responses = await asyncio.gather(*(fetcher.fetch(f"{base}/page/{n}") for n in range(1, 21)))
+            check(all(r.body == pages[n] for n, r in zip(range(1, 21), responses)), "pages still fetch after the errors")
+
+    try:
+        asyncio.run(main())
+    finally:
+        server.shutdown()
+        server.server_close()
+    if failures:
+        sys.exit(f"{len(failures)} fetch checks failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="scraper benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    fixtures = sub.add_parser("fixtures", help="write synthetic catalog pages to a directory")
+    fixtures.add_argument("--out", required=True)
+    fixtures.add_argument("--pages", type=int, default=200)
+    fixtures.add_argument("--products", type=int, default=40, help="product cards per page")
+
+    save = sub.add_parser("save", help="download real catalog pages as fixtures")
+    save.add_argument("--out", required=True)
+    save.add_argument("urls", nargs="+")
+
+    parse = sub.add_parser("parse", help="parse throughput per backend, then the extraction pool")
+    parse.add_argument("--pages", default=None, help="directory of .html fixtures (default: synthetic pages)")
+    parse.add_argument("--synthetic", type=int, default=200, help="synthetic pages when --pages isn't given")
+    parse.add_argument("--limit", type=int, default=project2.PRODUCT_LIMIT, help="products kept per page")
+    parse.add_argument("--all-products", action="store_true", help="keep every product (no limit)")
+    parse.add_argument("--backend", default=None, help="backend for the pool (default: best installed)")
+    parse.add_argument("--workers", type=int, default=project2.EXTRACT_WORKERS)
+    parse.add_argument("--batch", type=int, default=project2.EXTRACT_BATCH, help="pages per worker task")
+    parse.add_argument("--repeat", type=int, default=2)
+
+    fetch = sub.add_parser("fetch", help="async fetcher against a local HTTP server, with correctness checks")
+    fetch.add_argument("--pages", type=int, default=200)
+    fetch.add_argument("--per-host", type=int, default=project2.PER_HOST_LIMIT, help="connections per host")
+    fetch.add_argument("--repeat", type=int, default=3, help="rounds over all the pages, the best one is reported")
+
+    args = parser.parse_args()
+    if args.benchmark == "fixtures":
+        run_fixtures(args)
+    elif args.benchmark == "save":
+        run_save(args)
+    elif args.benchmark == "parse":
+        run_parse_benchmark(args)
+    elif args.benchmark == "fetch":
+        run_fetch_benchmark(args)